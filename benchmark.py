@@ -0,0 +1,194 @@
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+# Replays a seeded mix of searches against a generated (or CASEPRISM_DATA)
+# corpus and writes latency percentiles, throughput and peak memory as JSON,
+# so runs on different commits can be compared:
+#
+#   python benchmark.py --records 100000 --queries 1000 --output bench.json
+
+QUERY_KINDS = ["dropdown", "party", "act_section", "date_range", "citation", "phrase", "any_words", "all_words",
+               "ranked", "semantic"]
+
+# filter_rows arguments of a search with no filter applied
+NO_FILTERS = {"court": "ALL", "bench": "Select Bench", "judge": "", "act_section": "", "decision_date_range": None,
+              "search_text": "", "search_type": "Phrase(s)", "time_filter": "ALL",
+              "case_type": "Select Case Subject", "case_no": "", "year": "", "party": "",
+              "disposal_nature": "Select Disposal Nature", "search_method": "Exact Match"}
+
+
+# Import the app module and load the corpus (from the snapshot in INDEX_DIR
+# when it was built with the same settings) with the benchmark settings
+def load_app(records, seed):
+    os.environ["CASEPRISM_RECORDS"] = str(records)
+    os.environ["CASEPRISM_SEED"] = str(seed)
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gradio-caseprism-ui.py")
+    spec = importlib.util.spec_from_file_location("caseprism_ui", path)
+    app = importlib.util.module_from_spec(spec)
+    # Registered so search workers can unpickle references to its functions
+    sys.modules[spec.name] = app
+    spec.loader.exec_module(app)
+    app.load_data()
+    return app
+
+
+def iso_date(value):
+    return str(np.datetime64(value, "D"))
+
+
+# Seeded list of (kind, filter_rows kwargs), with values drawn from the corpus
+def query_mix(app, count, seed, kinds=QUERY_KINDS):
+    rng = np.random.default_rng(seed)
+    cases = app.cases
+    dropdowns = {"court": cases.values("Court"), "bench": cases.values("Bench"),
+                 "case_type": cases.values("Case Type"), "disposal_nature": cases.values("Disposal Nature"),
+                 "year": cases.values("Year")}
+    dates = cases.column("Decision Date").dropna().to_numpy()
+    citations = app.citation_index.citations
+
+    def pick(values):
+        return values[rng.integers(len(values))]
+
+    # A run of consecutive words from the judgement of a random case
+    def words(count):
+        text = app.judgement_texts.get([rng.integers(len(cases))])[0].replace(",", "").replace(".", "").split()
+        start = rng.integers(max(1, len(text) - count))
+        return " ".join(text[start:start + count])
+
+    queries = []
+    for kind in rng.choice(kinds, count):
+        query = dict(NO_FILTERS)
+        if kind == "dropdown":
+            for name in rng.choice(list(dropdowns), rng.integers(1, 4), replace=False):
+                query[name] = pick(dropdowns[name])
+        elif kind == "party":
+            query["party"] = pick(pick(cases.values("Petitioner") + cases.values("Respondent")).split())
+        elif kind == "act_section":
+            query["act_section"] = pick(cases.values("Act") + cases.values("Section"))
+        elif kind == "date_range":
+            start = iso_date(pick(dates))
+            query["time_filter"] = "Custom range"
+            query["decision_date_range"] = [start, iso_date(np.datetime64(start) + rng.integers(30, 366))]
+        elif kind == "citation":
+            query["citation"] = pick(citations)
+        elif kind == "semantic":
+            query["search_method"] = "Semantic Search"
+            query["search_text"] = words(rng.integers(3, 8))
+        elif kind == "ranked":
+            query["search_method"] = "Ranked"
+            query["search_text"] = words(rng.integers(1, 4))
+        else:
+            query["search_type"] = {"phrase": "Phrase(s)", "any_words": "Any Words", "all_words": "All Words"}[kind]
+            query["search_text"] = words(rng.integers(2, 4))
+        queries.append((str(kind), query))
+    return queries
+
+
+def summarize(seconds):
+    seconds = np.asarray(seconds)
+    p50, p95, p99 = np.percentile(seconds, [50, 95, 99]) * 1000
+    return {"count": len(seconds), "mean_ms": seconds.mean() * 1000, "p50_ms": p50, "p95_ms": p95, "p99_ms": p99,
+            "max_ms": seconds.max() * 1000}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+# Run every query as the Search button does (each stage of the search, then
+# its first page) and time it, to the first page shown and to the complete
+# results; the result cache is cleared before each one unless cached
+def run_benchmark(app, queries, cached=False, warmup=20):
+    for _, query in queries[:warmup]:
+        for rows, _ in app.search_stages(**query):
+            app.results_page(rows, 0)
+    timings = {}
+    first_rows = {}
+    results = []
+    started = time.perf_counter()
+    for kind, query in queries:
+        if not cached:
+            app.query_cache.clear()
+        query_started = time.perf_counter()
+        first_page = None
+        for rows, _ in app.search_stages(**query):
+            app.results_page(rows, 0)
+            if first_page is None:
+                first_page = time.perf_counter() - query_started
+        elapsed = time.perf_counter() - query_started
+        timings.setdefault(kind, []).append(elapsed)
+        first_rows.setdefault(kind, []).append(first_page)
+        results.append(len(rows))
+    total = time.perf_counter() - started
+    return timings, first_rows, results, total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the case search path")
+    parser.add_argument("--records", type=int, default=100000, help="dummy records to generate")
+    parser.add_argument("--queries", type=int, default=1000, help="queries to replay")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the corpus and the query mix")
+    parser.add_argument("--kinds", default=",".join(QUERY_KINDS), help="comma-separated query kinds to replay")
+    parser.add_argument("--workers", type=int, default=0, help="search worker processes (0 searches in-process)")
+    parser.add_argument("--cached", action="store_true", help="keep the result cache between queries")
+    parser.add_argument("--output", help="JSON file to write (printed when not given)")
+    args = parser.parse_args(argv)
+
+    load_started = time.perf_counter()
+    app = load_app(args.records, args.seed)
+    load_seconds = time.perf_counter() - load_started
+    if args.workers:
+        if app.snapshot is None:
+            app.share_indexes()
+        app.start_search_pool(args.workers)
+
+    queries = query_mix(app, args.queries, args.seed, args.kinds.split(","))
+    timings, first_rows, results, total = run_benchmark(app, queries, cached=args.cached)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "records": len(app.cases),
+        "source": str(app.source),
+        "seed": args.seed,
+        "workers": args.workers,
+        "cached": args.cached,
+        "load_seconds": load_seconds,
+        "snapshot": app.snapshot is not None,
+        "queries": len(queries),
+        "throughput_qps": len(queries) / total,
+        "mean_results": float(np.mean(results)),
+        # Time to the first page of results (a preview for slow searches)
+        "first_row_latency": summarize([t for kind in first_rows.values() for t in kind]),
+        "first_row_latency_by_kind": {kind: summarize(first_rows[kind]) for kind in sorted(first_rows)},
+        "latency": summarize([t for kind in timings.values() for t in kind]),
+        "latency_by_kind": {kind: summarize(timings[kind]) for kind in sorted(timings)},
+        # Of this process; search workers are separate processes
+        "peak_rss_mb": app.peak_rss_mb(),
+    }
+    if app.search_pool is not None:
+        app.search_pool.shutdown()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,37 @@
+import multiprocessing
+import threading
+
+
+class SearchCancelled(Exception):
+    pass
+
+
+# Cancellation flags of running searches, in shared memory so that search
+# workers forked after they are created see them set. A search holds one of
+# a fixed number of slots while it runs; cancel(slot) makes its next
+# check(slot) raise SearchCancelled, in whichever process it runs.
+class CancelFlags:
+    def __init__(self, slots):
+        self.flags = multiprocessing.RawArray("b", slots)
+        self.free = list(range(slots))
+        self.lock = threading.Lock()
+
+    # A slot with its flag cleared, or None when every slot is taken
+    def acquire(self):
+        with self.lock:
+            if not self.free:
+                return None
+            slot = self.free.pop()
+        self.flags[slot] = 0
+        return slot
+
+    def release(self, slot):
+        with self.lock:
+            self.free.append(slot)
+
+    def cancel(self, slot):
+        self.flags[slot] = 1
+
+    def check(self, slot):
+        if slot is not None and self.flags[slot]:
+            raise SearchCancelled()
@@ -0,0 +1,385 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from name_index import NameIndex
+
+# Low-cardinality string columns stored as categorical codes
+CATEGORICAL_COLUMNS = ["Court", "Judge", "Act", "Section", "Case Type", "Petitioner", "Respondent",
+                       "Disposal Nature", "Stage", "Bench"]
+
+# Columns used by the equality dropdown filters, each value gets a bitmap
+BITMAP_COLUMNS = ["Court", "Bench", "Case Type", "Disposal Nature", "Year"]
+
+# Integer columns and their storage types. Missing values are stored as the
+# type's smallest value and read back as <NA>.
+INT_COLUMNS = {"Year": "int16", "Case No": "int32"}
+
+# Date columns, parsed from "%d-%m-%Y" strings once at load time
+DATE_COLUMNS = ["Decision Date", "Registration Date"]
+
+# Columns of people's names, looked up through a NameIndex
+NAME_COLUMNS = ["Judge", "Petitioner", "Respondent", "Lawyers"]
+
+# Name columns holding several names per case, joined with NAME_SEPARATOR
+LIST_COLUMNS = ["Lawyers"]
+NAME_SEPARATOR = "; "
+
+
+def _file_name(column):
+    return column.lower().replace(" ", "_")
+
+
+# Mask of the missing values of an integer column
+def _missing_ints(values):
+    return values == np.iinfo(values.dtype).min
+
+
+# Strings stored as one UTF-8 buffer plus offsets, so the column can be
+# memory-mapped; values are only decoded for the rows that are read. Missing
+# values (None, NaN) are flagged in a mask, when there are any, and read back
+# as None.
+class StringColumn:
+    def __init__(self, offsets, data, missing=None):
+        self.offsets = offsets
+        self.data = data
+        self.missing = missing
+
+    @classmethod
+    def from_values(cls, values):
+        missing = np.asarray(pd.isna(values), dtype=bool)
+        encoded = [b"" if absent else str(value).encode() for value, absent in zip(values, missing)]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        return cls(offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8), missing if missing.any() else None)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, rows):
+        rows = np.arange(len(self))[rows] if isinstance(rows, slice) else np.asarray(rows)
+        offsets, data = self.offsets, self.data
+        values = np.empty(len(rows), dtype=object)
+        values[:] = [data[offsets[i]:offsets[i + 1]].tobytes().decode() for i in rows]
+        if self.missing is not None:
+            values[self.missing[rows]] = None
+        return values
+
+    def save(self, path):
+        np.save(path + ".offsets.npy", self.offsets)
+        np.save(path + ".data.npy", self.data)
+        if self.missing is not None:
+            np.save(path + ".missing.npy", self.missing)
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        missing = np.load(path + ".missing.npy", mmap_mode=mmap_mode) if os.path.exists(path + ".missing.npy") else None
+        return cls(np.load(path + ".offsets.npy", mmap_mode=mmap_mode), np.load(path + ".data.npy", mmap_mode=mmap_mode),
+                   missing)
+
+
+# Sorted view of a datetime64 column: a date range becomes two binary searches
+class DateIndex:
+    def __init__(self, order, sorted_dates, valid):
+        self.order = order
+        self.sorted_dates = sorted_dates
+        # NaT sorts last and never matches a range
+        self.valid = valid
+
+    @classmethod
+    def build(cls, dates):
+        order = np.argsort(dates, kind="stable")
+        return cls(order, dates[order], len(dates) - int(np.isnat(dates).sum()))
+
+    def _position(self, value, side):
+        return int(np.searchsorted(self.sorted_dates[:self.valid],
+                                   np.datetime64(value).astype(self.sorted_dates.dtype), side))
+
+    # Row ids (ascending) with start <= date <= end; either bound may be None
+    def range(self, start=None, end=None):
+        low = 0 if start is None else self._position(start, "left")
+        high = self.valid if end is None else self._position(end, "right")
+        return np.sort(self.order[low:high])
+
+
+# Columnar case table: each column is a numpy array (categorical codes, int16
+# years, int32 case numbers, datetime64 dates, object strings) or a
+# StringColumn, plus a packed bitmap per value of the dropdown columns. A
+# saved store is loaded memory-mapped, so processes share one read-only copy.
+class CaseStore:
+    def __init__(self, columns, categories=None):
+        self.columns = columns
+        self.categories = categories or {}
+        self.bitmaps = None
+        self.date_indexes = {}
+        self.name_indexes = {}
+        # Incremented whenever records are added
+        self.version = 0
+
+    def __len__(self):
+        return len(next(iter(self.columns.values())))
+
+    @classmethod
+    def from_frame(cls, frame):
+        return cls.from_frames([cls.compact(frame)])
+
+    # Build from chunks already passed through compact(), concatenating each
+    # column once (categoricals are merged without going through strings)
+    @classmethod
+    def from_frames(cls, frames):
+        columns = {}
+        categories = {}
+        for column in frames[0].columns:
+            parts = [frame[column] for frame in frames]
+            if isinstance(parts[0].dtype, pd.CategoricalDtype):
+                merged = union_categoricals(parts, sort_categories=True)
+                columns[column] = merged.codes
+                categories[column] = merged.categories
+            else:
+                columns[column] = np.concatenate([part.to_numpy() for part in parts])
+        return cls(columns, categories)
+
+    @staticmethod
+    def compact(frame):
+        frame = frame.reset_index(drop=True)
+        columns = {}
+        for column in frame.columns:
+            values = frame[column]
+            if column in CATEGORICAL_COLUMNS:
+                values = values.astype("category")
+            elif column in INT_COLUMNS:
+                dtype = INT_COLUMNS[column]
+                values = pd.to_numeric(values, errors="coerce").fillna(np.iinfo(dtype).min).astype(dtype)
+            elif column in DATE_COLUMNS and not pd.api.types.is_datetime64_any_dtype(values):
+                # Malformed dates (e.g. "31-02-2021") become NaT, like missing ones
+                values = pd.to_datetime(values, format="%d-%m-%Y", errors="coerce")
+            columns[column] = values
+        return pd.DataFrame(columns)
+
+    # Append records and return their row ids
+    def append(self, frame):
+        start = len(self)
+        new_frame = self.compact(frame)
+        for column, values in self.columns.items():
+            new_values = new_frame[column]
+            if column in self.categories:
+                categories = self.categories[column].union(new_values.cat.categories)
+                new_codes = pd.Categorical(new_values, categories=categories).codes
+                # Code -1 (missing) maps to itself through the appended -1
+                remap = np.append(categories.get_indexer(self.categories[column]), -1)
+                self.columns[column] = np.concatenate([remap[values].astype(new_codes.dtype), new_codes])
+                self.categories[column] = categories
+            else:
+                self.columns[column] = np.concatenate([values[:], new_values.to_numpy()])
+        self.bitmaps = None
+        self.date_indexes = {}
+        self.name_indexes = {}
+        self.version += 1
+        return np.arange(start, len(self))
+
+    def _build_bitmaps(self):
+        bitmaps = {}
+        size = (len(self) + 7) // 8
+        for column in BITMAP_COLUMNS:
+            if column not in self.columns:
+                continue
+            if column in self.categories:
+                labels, codes = self.categories[column], self.columns[column]
+            else:
+                # Missing integers get code -1, and no bitmap
+                codes, labels = pd.factorize(self._values(column, np.arange(len(self))), sort=True)
+            matrix = np.zeros((len(labels), size), dtype=np.uint8)
+            for code in range(len(labels)):
+                matrix[code] = np.packbits(codes == code)
+            # Keys are the string form of each value, which is what the UI sends
+            bitmaps[column] = ({str(label): code for code, label in enumerate(labels)}, matrix)
+        self.bitmaps = bitmaps
+
+    # Packed bitmap of rows where column equals value
+    def bitmap(self, column, value):
+        if self.bitmaps is None:
+            self._build_bitmaps()
+        # Sources without the column match no value
+        labels, matrix = self.bitmaps.get(column, ({}, None))
+        code = labels.get(str(value))
+        if code is None:
+            return np.zeros((len(self) + 7) // 8, dtype=np.uint8)
+        return matrix[code]
+
+    # Row ids selected by AND-ing the given bitmaps, restricted to rows when
+    # given (a date slice) so only those rows' bits are read. Without bitmaps
+    # rows is returned as is, None still standing for every row.
+    def select(self, bitmaps, rows=None):
+        if not bitmaps:
+            return rows
+        selected = bitmaps[0]
+        for bits in bitmaps[1:]:
+            selected = selected & bits
+        if rows is None:
+            return np.flatnonzero(np.unpackbits(selected, count=len(self)))
+        return rows[((selected[rows >> 3] >> (7 - (rows & 7))) & 1).astype(bool)]
+
+    # Row ids whose date column falls in [start, end], from the sorted index
+    def date_range(self, column, start=None, end=None):
+        if column not in self.columns:
+            # Sources without the column have no dates in any range
+            return np.empty(0, dtype=np.int64)
+        index = self.date_indexes.get(column)
+        if index is None:
+            index = self.date_indexes[column] = DateIndex.build(self.columns[column])
+        return index.range(start, end)
+
+    # Name index of a name column, built on first use
+    def name_index(self, column):
+        index = self.name_indexes.get(column)
+        if index is None:
+            if column in self.categories:
+                index = NameIndex.from_codes([str(name) for name in self.categories[column]], self.columns[column])
+            else:
+                index = NameIndex.from_lists(self.columns[column][:], NAME_SEPARATOR)
+            self.name_indexes[column] = index
+        return index
+
+    # Mask over rows whose value in column contains pattern (regex, as
+    # str.contains), evaluated once per distinct value instead of per row
+    def contains(self, column, rows, pattern, case=False):
+        if column not in self.columns:
+            return np.zeros(len(rows), dtype=bool)
+        if column in self.categories:
+            hit = np.append(self.categories[column].astype(str).str.contains(pattern, case=case), False)
+            return hit[self.columns[column][rows]]
+        distinct, inverse = np.unique(self.columns[column][rows], return_inverse=True)
+        hit = np.asarray(pd.Index(distinct.astype(str)).str.contains(pattern, case=case))
+        if column in INT_COLUMNS:
+            hit &= ~_missing_ints(distinct)
+        return hit[inverse]
+
+    # Number of rows (among rows) with each value of each column, as Series
+    # indexed by the string form of the value. Categorical columns count
+    # their codes with one bincount and include every category; other
+    # columns count only the values present. Columns the source lacks have
+    # no values.
+    def facets(self, rows, columns):
+        counts = {}
+        for column in columns:
+            if column not in self.columns:
+                counts[column] = pd.Series([], index=pd.Index([], dtype=object), name=column, dtype=np.int64)
+                continue
+            values = self.columns[column][rows]
+            if column in self.categories:
+                labels = self.categories[column].astype(str)
+                # Shift so missing values (-1) land in a dropped first bin
+                hits = np.bincount(values.astype(np.intp) + 1, minlength=len(labels) + 1)[1:]
+            else:
+                if column in INT_COLUMNS:
+                    values = values[~_missing_ints(values)]
+                labels, hits = np.unique(values, return_counts=True)
+                labels = labels.astype(str)
+            counts[column] = pd.Series(hits, index=labels, name=column)
+        return counts
+
+    # Distinct values of a column, sorted, for the dropdown choices
+    def values(self, column):
+        if column not in self.columns:
+            return []
+        if column in self.categories:
+            present = np.unique(self.columns[column])
+            return [str(label) for label in self.categories[column][present[present >= 0]]]
+        values = pd.unique(self.columns[column][:])
+        if column in INT_COLUMNS:
+            values = values[~_missing_ints(values)]
+        return sorted(values.astype(str).tolist())
+
+    def _values(self, column, rows):
+        if column in self.categories:
+            return pd.Categorical.from_codes(self.columns[column][rows], self.categories[column])
+        if column in INT_COLUMNS:
+            values = np.asarray(self.columns[column][rows])
+            return pd.arrays.IntegerArray(values, _missing_ints(values))
+        return self.columns[column][rows]
+
+    # One column for the given rows (all rows when None), indexed by row id
+    def column(self, column, rows=None):
+        rows = np.arange(len(self)) if rows is None else np.asarray(rows)
+        return pd.Series(self._values(column, rows), index=rows, name=column)
+
+    # Copy of only the selected rows (and columns, all by default), indexed
+    # by row id
+    def take(self, rows, columns=None):
+        rows = np.asarray(rows, dtype=np.int64)
+        columns = self.columns if columns is None else columns
+        return pd.DataFrame({column: self._values(column, rows) for column in columns}, index=rows)
+
+    # Write the columns and indexes to directory as .npy files
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        if self.bitmaps is None:
+            self._build_bitmaps()
+        for column in DATE_COLUMNS:
+            if column in self.columns:
+                self.date_range(column)
+        for column in NAME_COLUMNS:
+            if column in self.columns:
+                self.name_index(column)
+        meta = {"columns": [], "bitmaps": {}, "date_indexes": {}, "name_indexes": {}}
+        for column, values in self.columns.items():
+            path = os.path.join(directory, _file_name(column))
+            if isinstance(values, StringColumn) or values.dtype == object:
+                kind = "string"
+                values = values if isinstance(values, StringColumn) else StringColumn.from_values(values)
+                values.save(path)
+            else:
+                kind = "categorical" if column in self.categories else "array"
+                np.save(path + ".npy", values)
+            meta["columns"].append({"name": column, "kind": kind,
+                                    "categories": self.categories[column].tolist() if kind == "categorical" else None})
+        for column, (labels, matrix) in self.bitmaps.items():
+            np.save(os.path.join(directory, f"bitmaps.{_file_name(column)}.npy"), matrix)
+            meta["bitmaps"][column] = sorted(labels, key=labels.get)
+        for column, index in self.date_indexes.items():
+            path = os.path.join(directory, f"dates.{_file_name(column)}")
+            np.save(path + ".order.npy", index.order)
+            np.save(path + ".sorted.npy", index.sorted_dates)
+            meta["date_indexes"][column] = index.valid
+        for column, index in self.name_indexes.items():
+            path = os.path.join(directory, f"names.{_file_name(column)}")
+            np.save(path + ".rows.npy", index.rows)
+            np.save(path + ".offsets.npy", index.offsets)
+            meta["name_indexes"][column] = index.names
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+    # Load a saved store; arrays are memory-mapped read-only by default
+    @classmethod
+    def load(cls, directory, mmap_mode="r"):
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        columns = {}
+        categories = {}
+        for column in meta["columns"]:
+            name = column["name"]
+            path = os.path.join(directory, _file_name(name))
+            if column["kind"] == "string":
+                columns[name] = StringColumn.load(path, mmap_mode)
+            else:
+                columns[name] = np.load(path + ".npy", mmap_mode=mmap_mode)
+                if column["kind"] == "categorical":
+                    categories[name] = pd.Index(column["categories"])
+        store = cls(columns, categories)
+        store.bitmaps = {
+            column: ({label: code for code, label in enumerate(labels)},
+                     np.load(os.path.join(directory, f"bitmaps.{_file_name(column)}.npy"), mmap_mode=mmap_mode))
+            for column, labels in meta["bitmaps"].items()
+        }
+        for column, valid in meta["date_indexes"].items():
+            path = os.path.join(directory, f"dates.{_file_name(column)}")
+            store.date_indexes[column] = DateIndex(np.load(path + ".order.npy", mmap_mode=mmap_mode),
+                                                   np.load(path + ".sorted.npy", mmap_mode=mmap_mode), valid)
+        for column, names in meta.get("name_indexes", {}).items():
+            path = os.path.join(directory, f"names.{_file_name(column)}")
+            store.name_indexes[column] = NameIndex(names, np.load(path + ".rows.npy", mmap_mode=mmap_mode),
+                                                   np.load(path + ".offsets.npy", mmap_mode=mmap_mode))
+        return store
@@ -0,0 +1,200 @@
+import json
+import os
+import re
+import threading
+
+import numpy as np
+
+# Reporter citations recognized in judgement text, one pattern per form:
+#   (2017) 10 SCC 1, [1973] 1 SCR 1, (2020) 5 SCALE 12  - year, volume, reporter, page
+#   AIR 1973 SC 1461, AIR 2005 Bom 12                    - AIR year, court, page
+#   2023 INSC 123                                        - neutral citation
+# Reporters and AIR courts may be written with dots or spaces ("S.C.C.",
+# "A.I.R."), in any case and with any bracket around the year. Separate
+# patterns let the regex engine skip ahead to each form's first character
+# instead of trying every form at every position.
+REPORTER_RE = re.compile(r"[(\[](\d{4})[)\]]\s*(\d{1,3})\s+([Ss]\.?\s?[Cc]\.?\s?[CcRr]\b\.?|[Ss][Cc][Aa][Ll][Ee]\b)\s*(\d{1,5})")
+AIR_RE = re.compile(r"[Aa]\.?\s?[Ii]\.?\s?[Rr]\.?\s+(\d{4})\s+([A-Za-z][A-Za-z.]*(?:\s?&\s?[A-Za-z.]+)?)\s+(\d{1,5})")
+NEUTRAL_RE = re.compile(r"\b(\d{4})\s+INSC\s+(\d{1,5})")
+
+# Canonical form of each reporter's citations, by reporter abbreviation
+REPORTER_FORMATS = {"SCC": "({year}) {volume} SCC {page}", "SCR": "[{year}] {volume} SCR {page}",
+                    "SCALE": "({year}) {volume} SCALE {page}"}
+
+# Court abbreviations of AIR citations, keyed by their letters uppercased
+AIR_COURTS = {code.upper().replace("&", ""): code for code in
+              ["SC", "All", "AP", "Bom", "Cal", "Chh", "Del", "Guj", "HP", "J&K", "Jhar", "Kant", "Kar", "Ker",
+               "MP", "Mad", "Ori", "P&H", "Pat", "Raj", "Sikkim", "Uttarakhand"]}
+
+
+def _letters(value):
+    return re.sub(r"[^A-Za-z]", "", value).upper()
+
+
+# Distinct citations in text, canonical and in order of appearance
+def extract_citations(text):
+    text = str(text)
+    found = []
+    for match in REPORTER_RE.finditer(text):
+        year, volume, reporter, page = match.groups()
+        found.append((match.start(), REPORTER_FORMATS[_letters(reporter)].format(
+            year=year, volume=int(volume), page=int(page))))
+    for match in AIR_RE.finditer(text):
+        year, court, page = match.groups()
+        court = AIR_COURTS.get(_letters(court))
+        # "AIR" must start a word, as in "AIR 1973 SC 1461" but not "FAIR 1973 ..."
+        if court and not (match.start() and text[match.start() - 1].isalnum()):
+            found.append((match.start(), f"AIR {year} {court} {int(page)}"))
+    if "INSC" in text:
+        found += [(match.start(), f"{match.group(1)} INSC {int(match.group(2))}") for match in NEUTRAL_RE.finditer(text)]
+    found.sort()
+    return list(dict.fromkeys(citation for _, citation in found))
+
+
+# CSR adjacency of (source, target) pairs: the sorted targets of source i are
+# targets[offsets[i]:offsets[i + 1]]
+def _csr(sources, targets, num_sources):
+    sources = np.asarray(sources, dtype=np.int64)
+    order = np.lexsort((targets, sources))
+    return np.searchsorted(sources[order], np.arange(num_sources + 1)), np.asarray(targets, dtype=np.int64)[order]
+
+
+# Pairs of a CSR adjacency, the inverse of _csr
+def _pairs(offsets, targets):
+    return np.repeat(np.arange(len(offsets) - 1), np.diff(offsets)), np.asarray(targets)
+
+
+# Sorted distinct targets of the given sources
+def _neighbours(adjacency, sources):
+    offsets, targets = adjacency
+    parts = [targets[offsets[source]:offsets[source + 1]] for source in sources]
+    return np.unique(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+
+
+# Citation index of the cases, filled at ingestion: a hash map from each
+# canonical citation to its id, and four CSR adjacencies over ids and row
+# ids: the rows reported as each citation and, transposed, each row's own
+# citations; the citations each row's judgement cites and, transposed, the
+# rows citing each citation. Citations of judgements outside the corpus are
+# kept too, so "cases citing X" works whether or not X itself is loaded. A
+# lookup is one dict access and reading adjacent rows is a slice per id.
+class CitationIndex:
+    def __init__(self, citations=(), num_rows=0, reported=None, own=None, cites=None, cited_by=None):
+        self.citations = list(citations)
+        self.ids = {citation: i for i, citation in enumerate(self.citations)}
+        self.num_rows = num_rows
+        self.reported = reported
+        self.own = own
+        self.cites = cites
+        self.cited_by = cited_by
+        # (citation id, row) pairs added since the adjacencies were built
+        self.new_reported = ([], [])
+        self.new_cites = ([], [])
+        self.lock = threading.Lock()
+
+    def _id(self, citation):
+        citation_id = self.ids.get(citation)
+        if citation_id is None:
+            citation_id = self.ids[citation] = len(self.citations)
+            self.citations.append(citation)
+        return citation_id
+
+    # Index rows, given each row's own citations (text holding them, e.g.
+    # "(2017) 10 SCC 1; AIR 2017 SC 4161", or None) and judgement text
+    def add(self, row_ids, reported_as, texts):
+        for row, own, text in zip(row_ids, reported_as, texts):
+            own_ids = {self._id(citation) for citation in extract_citations(own or "")}
+            for citation_id in own_ids:
+                self.new_reported[0].append(citation_id)
+                self.new_reported[1].append(row)
+            for citation in extract_citations(text):
+                citation_id = self._id(citation)
+                # A judgement quoting its own citation does not cite itself
+                if citation_id not in own_ids:
+                    self.new_cites[0].append(citation_id)
+                    self.new_cites[1].append(row)
+            self.num_rows = max(self.num_rows, int(row) + 1)
+
+    # Merge added pairs into the adjacencies; rebuilt on first use after add
+    def _build(self):
+        with self.lock:
+            if self.new_reported[0] or self.new_cites[0] or self.reported is None:
+                self._merge()
+
+    def _merge(self):
+        reported = [np.array(values, dtype=np.int64) for values in self.new_reported]
+        cites = [np.array(values, dtype=np.int64) for values in self.new_cites]
+        if self.reported is not None:
+            reported = [np.concatenate(pair) for pair in zip(_pairs(*self.reported), reported)]
+            rows, citation_ids = _pairs(*self.cites)
+            cites = [np.concatenate(pair) for pair in zip((citation_ids, rows), cites)]
+        num_citations = len(self.citations)
+        self.reported = _csr(reported[0], reported[1], num_citations)
+        self.own = _csr(reported[1], reported[0], self.num_rows)
+        self.cites = _csr(cites[1], cites[0], self.num_rows)
+        self.cited_by = _csr(cites[0], cites[1], num_citations)
+        self.new_reported = ([], [])
+        self.new_cites = ([], [])
+
+    # Ids of the known citations found in query text
+    def lookup(self, query):
+        ids = (self.ids.get(citation) for citation in extract_citations(query))
+        return [citation_id for citation_id in ids if citation_id is not None]
+
+    # Sorted rows reported as any of the citation ids
+    def reported_rows(self, citation_ids):
+        self._build()
+        return _neighbours(self.reported, citation_ids)
+
+    # Sorted rows whose judgements cite any of the citation ids
+    def citing_rows(self, citation_ids):
+        self._build()
+        return _neighbours(self.cited_by, citation_ids)
+
+    # Citation ids a row is reported as, and those its judgement cites
+    def own_citations(self, row):
+        self._build()
+        return self._targets(self.own, row)
+
+    def cited_citations(self, row):
+        self._build()
+        return self._targets(self.cites, row)
+
+    @staticmethod
+    def _targets(adjacency, row):
+        offsets, targets = adjacency
+        if row + 1 >= len(offsets):
+            return np.empty(0, dtype=np.int64)
+        return np.asarray(targets[offsets[row]:offsets[row + 1]])
+
+    # Cases related to a row through citations: the loaded cases its
+    # judgement cites, the citations it cites that are not loaded, and the
+    # cases citing it
+    def related(self, row):
+        cited = self.cited_citations(row)
+        cited_rows = self.reported_rows(cited)
+        offsets = self.reported[0]
+        unresolved = [self.citations[i] for i in cited if offsets[i] == offsets[i + 1]]
+        citing = self.citing_rows(self.own_citations(row))
+        return cited_rows[cited_rows != row], unresolved, citing[citing != row]
+
+    # Write the citations and adjacencies to directory
+    def save(self, directory):
+        self._build()
+        os.makedirs(directory, exist_ok=True)
+        for name in ("reported", "own", "cites", "cited_by"):
+            offsets, targets = getattr(self, name)
+            np.save(os.path.join(directory, f"{name}.offsets.npy"), offsets)
+            np.save(os.path.join(directory, f"{name}.targets.npy"), targets)
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump({"num_rows": self.num_rows, "citations": self.citations}, f)
+
+    # Load a saved index, adjacencies memory-mapped
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        adjacencies = {name: (np.load(os.path.join(directory, f"{name}.offsets.npy"), mmap_mode="r"),
+                              np.load(os.path.join(directory, f"{name}.targets.npy"), mmap_mode="r"))
+                       for name in ("reported", "own", "cites", "cited_by")}
+        return cls(meta["citations"], meta["num_rows"], **adjacencies)
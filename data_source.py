@@ -0,0 +1,421 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from case_store import NAME_SEPARATOR
+
+# Columns of a case record
+CASE_COLUMNS = ["Court", "Judge", "Act", "Section", "Decision Date", "Registration Date", "Case Type", "Case No",
+                "Year", "Petitioner", "Respondent", "Disposal Nature", "Case Title", "Judgement Text", "Stage",
+                "Bench", "PDF Link", "Lawyers", "Citation"]
+
+# Full judgement text is kept out of the case table and read from a text store
+TEXT_COLUMN = "Judgement Text"
+
+# Records read per chunk during ingestion
+CHUNK_SIZE = 50000
+
+# Median number of body sentences in a generated judgement
+BODY_SENTENCES = 12
+
+# Most judgements a generated judgement cites
+MAX_CITED = 4
+
+# Landmark judgements cited by generated cases, which are not in the corpus
+LANDMARK_CITATIONS = ["AIR 1973 SC 1461", "(2017) 10 SCC 1", "(1978) 1 SCC 248", "AIR 1950 SC 27",
+                      "(1997) 6 SCC 241", "(1980) 2 SCC 684", "(2018) 10 SCC 1", "[1950] 1 SCR 88"]
+
+LEGAL_TERMS = ["res judicata", "locus standi", "ratio decidendi", "obiter dicta", "audi alteram partem",
+               "mens rea", "sub judice", "stare decisis", "habeas corpus", "mandamus", "certiorari",
+               "natural justice", "burden of proof", "anticipatory bail", "legitimate expectation"]
+
+# AIR abbreviations of the generated High Courts
+_AIR_COURTS = {"Bombay High Court": "Bom", "Delhi High Court": "Del", "Madras High Court": "Mad",
+               "Calcutta High Court": "Cal", "Karnataka High Court": "Kar", "Allahabad High Court": "All",
+               "Gujarat High Court": "Guj", "Punjab & Haryana High Court": "P&H"}
+
+
+# Generate dummy data: num_records cases drawn with numpy from seed (anything
+# np.random.default_rng accepts; None draws fresh randomness each call)
+def generate_dummy_data(num_records=1000, seed=None):
+    rng = np.random.default_rng(seed)
+
+    courts = ["Supreme Court", "Bombay High Court", "Delhi High Court", "Madras High Court", "Calcutta High Court", 
+              "Karnataka High Court", "Allahabad High Court", "Gujarat High Court", "Punjab & Haryana High Court"]
+    
+    judges = ["Justice A.K. Sikri", "Justice D.Y. Chandrachud", "Justice Sanjiv Khanna", "Justice Rohinton Nariman",
+              "Justice Indu Malhotra", "Justice N.V. Ramana", "Justice Ranjan Gogoi", "Justice U.U. Lalit", 
+              "Justice S. Ravindra Bhat", "Justice B.R. Gavai"]
+    
+    acts = ["Indian Penal Code", "Constitution of India", "Code of Criminal Procedure", "Income Tax Act",
+            "Goods and Services Tax Act", "Prevention of Corruption Act", "Companies Act", 
+            "Negotiable Instruments Act", "Arbitration and Conciliation Act", "Hindu Marriage Act"]
+    
+    sections = ["Section 302", "Section 420", "Section 377", "Section 498A", "Section 376", "Section 307",
+                "Article 14", "Article 21", "Article 32", "Section 138"]
+    
+    case_types = ["Criminal Appeal", "Civil Appeal", "Special Leave Petition", "Writ Petition", 
+                  "Review Petition", "Curative Petition", "Transfer Petition", "Original Suit"]
+    
+    disposal_types = ["Disposed", "Pending", "Dismissed", "Allowed", "Partly Allowed", "Withdrawn", "Admission Stage"]
+    
+    stages = ["ADMISSION STAGE", "HEARING STAGE", "FINAL STAGE", "DISPOSED"]
+    
+    benches = ["Principal Bench", "Aurangabad Bench", "Nagpur Bench", "Delhi Bench", "Lucknow Bench"]
+    
+    petitioners = ["State of Maharashtra", "Union of India", "Income Tax Department", "Bharti Airtel Ltd.",
+                  "Tata Motors", "Reliance Industries", "Mukesh Ambani", "Ratan Tata", "Common Cause", 
+                  "People's Union for Civil Liberties"]
+    
+    respondents = ["Union of India", "State of Maharashtra", "Municipal Corporation of Delhi", "Vijay Mallya",
+                  "Central Bureau of Investigation", "Enforcement Directorate", "Reserve Bank of India",
+                  "Election Commission of India", "Securities and Exchange Board of India"]
+    
+    lawyer_first_names = ["Harish", "Kapil", "Mukul", "Abhishek", "Indira", "Gopal", "Prashant", "Menaka", "Fali",
+                          "Shyam", "Rakesh", "Meenakshi", "Sanjay", "Vikas", "Aishwarya", "Rohan", "Karuna", "Arvind"]
+    
+    lawyer_surnames = ["Salve", "Sibal", "Rohatgi", "Singhvi", "Jaising", "Subramanium", "Bhushan", "Guruswamy",
+                       "Nariman", "Divan", "Dwivedi", "Arora", "Hegde", "Singh", "Bhati", "Nundy", "Datar", "Rao"]
+
+    def choose(values):
+        return np.asarray(values, dtype=object)[rng.integers(0, len(values), num_records)]
+
+    court = choose(courts)
+    act = choose(acts)
+    section = choose(sections)
+    petitioner = choose(petitioners)
+    respondent = choose(respondents)
+    disposal_nature = choose(disposal_types)
+
+    # Decision dates in the past 5 years, registered 30 days to 3 years earlier
+    today = np.datetime64(datetime.now().date())
+    decision_date = today - 5 * 365 + rng.integers(0, 5 * 365 + 1, num_records)
+    registration_date = decision_date - rng.integers(30, 3 * 365 + 1, num_records)
+    
+    # One to three advocates per case, from a fixed pool of names
+    lawyer_pool = np.array([f"{first} {last}" for first in lawyer_first_names for last in lawyer_surnames], dtype=object)
+    lawyer_picks = lawyer_pool[rng.integers(0, len(lawyer_pool), (num_records, 3))]
+    lawyers = [NAME_SEPARATOR.join(names[:count]) for names, count in zip(lawyer_picks, rng.integers(1, 4, num_records))]
+    
+    # Generate dummy case title
+    case_title = petitioner + " vs " + respondent
+    
+    # Each case is reported in SCC (Supreme Court) or AIR (High Courts) in
+    # its decision year
+    year_text = (decision_date.astype("datetime64[Y]").astype(int) + 1970).astype(str).astype(object)
+    page_text = rng.integers(1, 2000, num_records).astype(str).astype(object)
+    volume_text = rng.integers(1, 13, num_records).astype(str).astype(object)
+    air_court = np.array([_AIR_COURTS.get(name, "SC") for name in court], dtype=object)
+    citation = np.where(court == "Supreme Court", "(" + year_text + ") " + volume_text + " SCC " + page_text,
+                        "AIR " + year_text + " " + air_court + " " + page_text)
+    
+    # Judgements cite up to MAX_CITED cases decided before them, and
+    # sometimes a landmark judgement, and discuss two legal terms
+    rank = np.empty(num_records, dtype=np.int64)
+    by_date = np.argsort(decision_date, kind="stable")
+    rank[by_date] = np.arange(num_records)
+    cited = by_date[(rng.random((num_records, MAX_CITED)) * rank[:, None]).astype(np.int64)]
+    num_cited = np.where(rank > 0, rng.integers(0, MAX_CITED + 1, num_records), 0)
+    landmark = np.asarray(LANDMARK_CITATIONS, dtype=object)[rng.integers(0, len(LANDMARK_CITATIONS), num_records)]
+    landmark = np.where(rng.random(num_records) < 0.3, landmark, None)
+    references = np.array([", ".join(refs[:count] + ([extra] if extra else [])) for refs, count, extra in
+                           zip(citation[cited].tolist(), num_cited.tolist(), landmark)], dtype=object)
+    terms = np.asarray(LEGAL_TERMS, dtype=object)[rng.integers(0, len(LEGAL_TERMS), (num_records, 2))]
+    discussion = ("The court considered the principles of " + terms[:, 0] + " and " + terms[:, 1] + "."
+                  + np.where(references != "", " Reliance was placed on " + references + ".", ""))
+    
+    # Judgement text: a summary sentence followed by a body of sentences
+    # drawn from a Zipf-distributed vocabulary, with log-normal lengths
+    summary = ("In the matter of " + case_title + ", the " + court + " has considered the arguments presented by both parties. "
+               "The case pertains to " + act + " " + section + ". After due consideration, the court has decided to "
+               + np.char.lower(disposal_nature.astype(str)).astype(object) + " the petition.")
+    sentences = _dummy_sentences(rng)
+    body_lengths = np.clip(rng.lognormal(np.log(BODY_SENTENCES), 0.8, num_records).astype(np.int64), 0, 20 * BODY_SENTENCES)
+    picks = rng.integers(0, len(sentences), int(body_lengths.sum()))
+    ends = np.cumsum(body_lengths)
+    judgement_text = [text + " " + " ".join(sentences[picks[end - length:end]]) + " " + references if length
+                      else text + " " + references
+                      for text, length, end, references in zip(summary, body_lengths, ends, discussion)]
+    
+    # Generate a dummy PDF link for the judgement
+    # In a real application, these would be actual links to stored PDFs
+    # pdf_link = f"https://judgements.ecourts.gov.in/pdfs/{court.lower().replace(' ', '_')}/{year}/{case_no}.pdf"
+    pdf_link = "/home/shiva_123/case-prizm-frontend/43b7fbcdfaf949adb92e8553b0e8c50d849b113f8272b939420035696feeb31d1746440594.pdf"
+    
+    return pd.DataFrame({
+        "Court": court,
+        "Judge": choose(judges),
+        "Act": act,
+        "Section": section,
+        # Format dates as strings
+        "Decision Date": _format_dates(decision_date),
+        "Registration Date": _format_dates(registration_date),
+        "Case Type": choose(case_types),
+        "Case No": rng.integers(1, 10000, num_records),
+        "Year": rng.integers(2010, 2026, num_records),
+        "Petitioner": petitioner,
+        "Respondent": respondent,
+        "Disposal Nature": disposal_nature,
+        "Case Title": case_title,
+        "Judgement Text": judgement_text,
+        "Stage": choose(stages),
+        "Bench": choose(benches),
+        "PDF Link": pdf_link,
+        "Lawyers": lawyers,
+        "Citation": citation
+    })
+
+# "%d-%m-%Y" strings of datetime64 dates, formatting each distinct date once
+def _format_dates(dates):
+    distinct, inverse = np.unique(dates, return_inverse=True)
+    return pd.DatetimeIndex(distinct).strftime("%d-%m-%Y").to_numpy(dtype=object)[inverse]
+
+
+# Common words of judgements, the most frequent ranks of the dummy vocabulary
+_COMMON_WORDS = ("the of and to in that is a by be for was court on as it with under not this has which "
+                 "or petitioner respondent section act order high appeal said are from an no any been learned "
+                 "counsel held case state also would evidence accused law therefore judgment para may trial "
+                 "made facts rule present such provisions matter submitted relied contention application "
+                 "proceedings sub clause inter alia whereas plaintiff defendant tribunal authority notice "
+                 "impugned bench hon'ble writ petition affidavit statute jurisdiction constitution article "
+                 "decree suit liability compensation conviction sentence bail custody police investigation "
+                 "prosecution witness testimony examination statement finding conclusion reasons principle "
+                 "precedent appellant government department officer circular notification schedule").split()
+
+
+# Vocabulary in Zipf rank order: the common words, then a long tail of
+# pseudo-words so the index sees a realistically large vocabulary
+def _dummy_vocabulary(size=20000):
+    syllables = ["ka", "ri", "mo", "ta", "ven", "sha", "lu", "dar", "pe", "ni", "gor", "ba", "si", "lam", "tu",
+                 "ro", "che", "vi", "nad", "ko", "mi", "ras", "de", "pa", "hal", "ju", "ne", "sar", "bo", "li"]
+    tail = [a + b + c for a in syllables for b in syllables for c in ("", "n", "ar", "ite", "ment", "al")]
+    tail = np.random.default_rng(0).permutation(tail)[:size - len(_COMMON_WORDS)]
+    return np.array(_COMMON_WORDS + tail.tolist(), dtype=object)
+
+
+# Pool of sentences (8 to 40 words, Zipf-distributed) that generated
+# judgement bodies are assembled from
+def _dummy_sentences(rng, count=8192):
+    vocabulary = _dummy_vocabulary()
+    weights = 1.0 / np.arange(1, len(vocabulary) + 1) ** 1.07
+    lengths = rng.integers(8, 41, count)
+    words = vocabulary[rng.choice(len(vocabulary), int(lengths.sum()), p=weights / weights.sum())]
+    ends = np.cumsum(lengths)
+    return np.array([" ".join(words[end - length:end]).capitalize() + "." for length, end in zip(lengths, ends)],
+                    dtype=object)
+
+
+# Judgement texts by row id. Texts of records added after loading are kept in
+# memory; subclasses read the loaded rows from the source on demand.
+class TextStore:
+    def __init__(self):
+        self.num_loaded = 0
+        self.extra = []
+
+    def __len__(self):
+        return self.num_loaded + len(self.extra)
+
+    def append(self, texts):
+        self.extra.extend(texts)
+
+    def get(self, rows):
+        rows = np.asarray(rows, dtype=np.int64)
+        texts = [None] * len(rows)
+        loaded = rows < self.num_loaded
+        if loaded.any():
+            for i, text in zip(np.flatnonzero(loaded), self._read(rows[loaded])):
+                texts[i] = text
+        for i in np.flatnonzero(~loaded):
+            texts[i] = self.extra[rows[i] - self.num_loaded]
+        return texts
+
+    def _read(self, rows):
+        raise NotImplementedError
+
+
+# Texts of sources that cannot be read back by row (generated records),
+# written a chunk at a time to an unlinked temporary file as they are loaded,
+# so memory holds only their offsets. Rows are read back with pread, which
+# leaves the file's pages to the OS cache.
+class SpilledTextStore(TextStore):
+    def __init__(self, directory=None):
+        super().__init__()
+        self.file = tempfile.TemporaryFile(dir=directory)
+        self.offsets = [np.zeros(1, dtype=np.int64)]
+        self.flushed = True
+        self.lock = threading.Lock()
+
+    def add_loaded(self, texts):
+        if not len(texts):
+            return
+        encoded = [str(text).encode() for text in texts]
+        with self.lock:
+            self.file.write(b"".join(encoded))
+            self.offsets.append(self.offsets[-1][-1] + np.cumsum([len(text) for text in encoded], dtype=np.int64))
+            self.num_loaded += len(texts)
+            self.flushed = False
+
+    def _read(self, rows):
+        with self.lock:
+            if not self.flushed:
+                self.file.flush()
+                self.offsets = [np.concatenate(self.offsets)]
+                self.flushed = True
+            offsets = self.offsets[0]
+        fd = self.file.fileno()
+        return [os.pread(fd, int(offsets[row + 1] - offsets[row]), int(offsets[row])).decode() for row in rows]
+
+
+# Texts read from the Parquet file one row group at a time, keeping the most
+# recently used row groups
+class ParquetTextStore(TextStore):
+    def __init__(self, path, cached_row_groups=4):
+        super().__init__()
+        self.file = _parquet_file(path)
+        counts = [self.file.metadata.row_group(i).num_rows for i in range(self.file.num_row_groups)]
+        self.row_group_starts = np.concatenate([[0], np.cumsum(counts)])
+        self.num_loaded = int(self.row_group_starts[-1])
+        self.cached_row_groups = cached_row_groups
+        self.cache = OrderedDict()
+        # Searches, the case viewer and exports read from several threads.
+        # The file is read under the lock too, as its reader is not safe to
+        # share between threads.
+        self.lock = threading.Lock()
+
+    def _row_group(self, i):
+        with self.lock:
+            if i in self.cache:
+                self.cache.move_to_end(i)
+            else:
+                self.cache[i] = self.file.read_row_group(i, columns=[TEXT_COLUMN]).column(0).to_pylist()
+                if len(self.cache) > self.cached_row_groups:
+                    self.cache.popitem(last=False)
+            return self.cache[i]
+
+    def _read(self, rows):
+        groups = np.searchsorted(self.row_group_starts, rows, side="right") - 1
+        return [self._row_group(g)[row - self.row_group_starts[g]] for row, g in zip(rows, groups)]
+
+
+# Texts read from the SQLite table by rowid
+class SqliteTextStore(TextStore):
+    def __init__(self, path, table):
+        super().__init__()
+        self.path = path
+        self.table = table
+        self.rowids = []
+
+    def add_loaded(self, rowids):
+        self.rowids.append(np.asarray(rowids, dtype=np.int64))
+        self.num_loaded += len(rowids)
+
+    def _read(self, rows):
+        if len(self.rowids) > 1:
+            self.rowids = [np.concatenate(self.rowids)]
+        rowids = self.rowids[0][rows].tolist()
+        texts = {}
+        with _connect(self.path) as conn:
+            # SQLite limits the number of bound parameters per statement
+            for start in range(0, len(rowids), 900):
+                batch = rowids[start:start + 900]
+                query = f'SELECT rowid, "{TEXT_COLUMN}" FROM "{self.table}" WHERE rowid IN ({",".join("?" * len(batch))})'
+                texts.update(conn.execute(query, batch).fetchall())
+        return [texts[rowid] for rowid in rowids]
+
+
+# A data source yields the case records in chunks (DataFrames with
+# CASE_COLUMNS) and provides the text store for the judgement texts
+class DummySource:
+    def __init__(self, num_records, chunk_size=CHUNK_SIZE, seed=None):
+        self.num_records = num_records
+        self.chunk_size = chunk_size
+        self.seed = seed
+        self.texts = SpilledTextStore()
+
+    def __str__(self):
+        return f"{self.num_records} generated records"
+
+    def chunks(self):
+        for start in range(0, self.num_records, self.chunk_size):
+            # Each chunk draws from its own stream derived from the seed
+            seed = None if self.seed is None else [self.seed, start]
+            chunk = generate_dummy_data(min(self.chunk_size, self.num_records - start), seed)
+            self.texts.add_loaded(chunk[TEXT_COLUMN].tolist())
+            yield chunk
+
+
+def _parquet_file(path):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Install pyarrow to load cases from Parquet") from e
+    return pq.ParquetFile(path, memory_map=True)
+
+
+# Parquet file (memory-mapped) read batch by batch, only the case columns
+class ParquetSource:
+    def __init__(self, path, chunk_size=CHUNK_SIZE):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.texts = ParquetTextStore(path)
+
+    def __str__(self):
+        return self.path
+
+    def chunks(self):
+        file = _parquet_file(self.path)
+        columns = [c for c in CASE_COLUMNS if c in file.schema_arrow.names]
+        for batch in file.iter_batches(batch_size=self.chunk_size, columns=columns):
+            yield batch.to_pandas()
+
+
+def _connect(path):
+    return sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+
+
+# SQLite table read with a chunked cursor
+class SqliteSource:
+    def __init__(self, path, table="cases", chunk_size=CHUNK_SIZE):
+        self.path = path
+        self.table = table
+        self.chunk_size = chunk_size
+        self.texts = SqliteTextStore(path, table)
+
+    def __str__(self):
+        return f"{self.path}:{self.table}"
+
+    def chunks(self):
+        with _connect(self.path) as conn:
+            names = [row[1] for row in conn.execute(f'PRAGMA table_info("{self.table}")')]
+            columns = ", ".join(f'"{c}"' for c in CASE_COLUMNS if c in names)
+            query = f'SELECT rowid AS "_rowid", {columns} FROM "{self.table}" ORDER BY rowid'
+            for chunk in pd.read_sql_query(query, conn, chunksize=self.chunk_size):
+                self.texts.add_loaded(chunk.pop("_rowid").to_numpy())
+                yield chunk
+
+
+# Peak resident set size of this process in MB
+def peak_rss_mb():
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and in KB elsewhere
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+# Data source for a path (by extension), or generated records when not given
+def open_source(path=None, num_records=1500, seed=None):
+    if not path:
+        return DummySource(num_records, seed=seed)
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".parquet", ".pq"):
+        return ParquetSource(path)
+    if extension in (".sqlite", ".sqlite3", ".db"):
+        return SqliteSource(path)
+    raise ValueError(f"Unsupported data source: {path}")
@@ -0,0 +1,100 @@
+import mmap
+import os
+import re
+import threading
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+from data_source import TextStore
+
+# PDF files are named by the hash already used in "PDF Link"
+PDF_NAME_RE = re.compile(r"^[0-9a-f]+\.pdf$")
+
+# Judgements kept decoded after being viewed
+CACHED_DOCUMENTS = 64
+
+
+# Judgement texts in one file of individually zlib-compressed documents, with
+# an offsets array: document i is data[offsets[i]:offsets[i + 1]]. Both are
+# memory-mapped, so reading one document touches only its own pages.
+class PackedTextStore(TextStore):
+    def __init__(self, path):
+        super().__init__()
+        self.offsets = np.load(path + ".offsets.npy", mmap_mode="r")
+        self.num_loaded = len(self.offsets) - 1
+        with open(path + ".bin", "rb") as f:
+            # mmap cannot map an empty file
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.offsets[-1] else b""
+
+    # Compress texts (an iterable of strings) into path.bin / path.offsets.npy
+    @staticmethod
+    def write(path, texts):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        offsets = [0]
+        with open(path + ".bin", "wb") as f:
+            for text in texts:
+                compressed = zlib.compress(str(text).encode())
+                f.write(compressed)
+                offsets.append(offsets[-1] + len(compressed))
+        np.save(path + ".offsets.npy", np.array(offsets, dtype=np.int64))
+
+    def _read(self, rows):
+        offsets = self.offsets
+        return [zlib.decompress(self.data[offsets[row]:offsets[row + 1]]).decode() for row in rows]
+
+
+# Full judgements for the case viewer: texts read lazily from a text store
+# through a small LRU of recently viewed documents, and PDFs from a directory
+# keyed by file name
+class DocumentStore:
+    def __init__(self, texts, pdf_dir, cache_size=CACHED_DOCUMENTS):
+        self.texts = texts
+        self.pdf_dir = pdf_dir
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+
+    def text(self, row_id):
+        row_id = int(row_id)
+        with self.lock:
+            if row_id in self.cache:
+                self.cache.move_to_end(row_id)
+                return self.cache[row_id]
+        text = self.texts.get([row_id])[0]
+        with self.lock:
+            self.cache[row_id] = text
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return text
+
+    # File name of the PDF for a "PDF Link" value, if it is in the store
+    def pdf_name(self, pdf_link):
+        name = os.path.basename(str(pdf_link))
+        if PDF_NAME_RE.match(name) and os.path.isfile(os.path.join(self.pdf_dir, name)):
+            return name
+        return None
+
+    def pdf_path(self, name):
+        if not PDF_NAME_RE.match(name):
+            return None
+        path = os.path.join(self.pdf_dir, name)
+        return path if os.path.isfile(path) else None
+
+
+# Add GET /judgements/<name>.pdf to a FastAPI app. FileResponse answers HTTP
+# Range requests with 206 partial content, so PDF viewers fetch only the
+# pages they show instead of downloading the whole judgement.
+def add_document_routes(app, documents):
+    from fastapi import HTTPException
+    from fastapi.responses import FileResponse
+
+    @app.get("/judgements/{name}")
+    def judgement_pdf(name: str):
+        path = documents.pdf_path(name)
+        if path is None:
+            raise HTTPException(status_code=404, detail="Judgement not found")
+        return FileResponse(path, media_type="application/pdf", content_disposition_type="inline")
+
+    return app
@@ -0,0 +1,120 @@
+import os
+import re
+import tempfile
+import time
+import uuid
+
+# Export formats and their file extensions
+EXPORT_FORMATS = {"CSV": ".csv", "JSONL": ".jsonl", "Parquet": ".parquet"}
+
+# Rows read and written at a time by an export
+EXPORT_CHUNK_ROWS = 10000
+
+# Exported files are deleted this long after they were written
+EXPORT_TTL_SECONDS = 60 * 60
+
+# Exported files are named by a random id, so one user cannot guess another's
+EXPORT_NAME_RE = re.compile(r"^[0-9a-f]{32}\.(csv|jsonl|parquet)$")
+
+
+def _write_csv(path, chunks):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        for i, frame in enumerate(chunks):
+            # Dates in the "%d-%m-%Y" form the case records use
+            frame.to_csv(f, header=i == 0, index=False, date_format="%d-%m-%Y")
+
+
+def _write_jsonl(path, chunks):
+    with open(path, "w", encoding="utf-8") as f:
+        for frame in chunks:
+            if len(frame):
+                f.write(frame.to_json(orient="records", lines=True, date_format="iso", force_ascii=False)
+                        .rstrip("\n") + "\n")
+
+
+def _write_parquet(path, chunks):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Install pyarrow to export results as Parquet") from e
+    writer = None
+    try:
+        # One row group per chunk; every chunk has the first one's schema.
+        # A text column with no values in the first chunk has the null type
+        # there, so it is written as strings that later chunks can fill.
+        for frame in chunks:
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if writer is None:
+                schema = table.schema
+                for i, field in enumerate(schema):
+                    if pa.types.is_null(field.type):
+                        schema = schema.set(i, field.with_type(pa.string()))
+                writer = pq.ParquetWriter(path, schema)
+            writer.write_table(table.cast(writer.schema))
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        # No chunks: an empty file is not valid Parquet, write an empty table
+        pq.write_table(pa.table({}), path)
+
+
+_WRITERS = {"CSV": _write_csv, "JSONL": _write_jsonl, "Parquet": _write_parquet}
+
+
+# Exported result files in a temporary directory. Rows arrive as an iterator
+# of DataFrame chunks and each chunk is written before the next is read, so
+# memory is bounded by the chunk size however many rows are exported. A file
+# is written under a temporary name and renamed when complete, so it is
+# never served half written.
+class ExportStore:
+    def __init__(self, directory=None, ttl=EXPORT_TTL_SECONDS):
+        self.directory = directory or os.path.join(tempfile.gettempdir(), "caseprism-exports")
+        self.ttl = ttl
+
+    # Write the chunks in file_format (a key of EXPORT_FORMATS) and return
+    # the file's name
+    def write(self, chunks, file_format):
+        os.makedirs(self.directory, exist_ok=True)
+        self.remove_expired()
+        name = uuid.uuid4().hex + EXPORT_FORMATS[file_format]
+        path = os.path.join(self.directory, name)
+        try:
+            _WRITERS[file_format](path + ".part", chunks)
+            os.replace(path + ".part", path)
+        finally:
+            if os.path.exists(path + ".part"):
+                os.remove(path + ".part")
+        return name
+
+    def path(self, name):
+        if not EXPORT_NAME_RE.match(name):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+    def remove_expired(self):
+        cutoff = time.time() - self.ttl
+        for entry in os.scandir(self.directory):
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+
+# Add GET /exports/<name> to a FastAPI app, serving exported files as
+# downloads streamed from disk
+def add_export_routes(app, exports):
+    from fastapi import HTTPException
+    from fastapi.responses import FileResponse
+
+    @app.get("/exports/{name}")
+    def exported_file(name: str):
+        path = exports.path(name)
+        if path is None:
+            raise HTTPException(status_code=404, detail="Export not found")
+        return FileResponse(path, filename="caseprism-results" + os.path.splitext(name)[1])
+
+    return app
@@ -1,232 +1,741 @@
-import gradio as gr
+import time
+
+# Startup is timed from here, before the imports
+STARTED = time.perf_counter()
+
+import argparse
+import multiprocessing
+import numpy as np
+import os
 import pandas as pd
-import random
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 
-# Generate dummy data
-def generate_dummy_data(num_records=1000):
-    courts = ["Supreme Court", "Bombay High Court", "Delhi High Court", "Madras High Court", "Calcutta High Court", 
-              "Karnataka High Court", "Allahabad High Court", "Gujarat High Court", "Punjab & Haryana High Court"]
-    
-    judges = ["Justice A.K. Sikri", "Justice D.Y. Chandrachud", "Justice Sanjiv Khanna", "Justice Rohinton Nariman",
-              "Justice Indu Malhotra", "Justice N.V. Ramana", "Justice Ranjan Gogoi", "Justice U.U. Lalit", 
-              "Justice S. Ravindra Bhat", "Justice B.R. Gavai"]
-    
-    acts = ["Indian Penal Code", "Constitution of India", "Code of Criminal Procedure", "Income Tax Act",
-            "Goods and Services Tax Act", "Prevention of Corruption Act", "Companies Act", 
-            "Negotiable Instruments Act", "Arbitration and Conciliation Act", "Hindu Marriage Act"]
-    
-    sections = ["Section 302", "Section 420", "Section 377", "Section 498A", "Section 376", "Section 307",
-                "Article 14", "Article 21", "Article 32", "Section 138"]
+from cancellation import CancelFlags, SearchCancelled
+from case_store import CaseStore
+from citations import CitationIndex
+from data_source import CASE_COLUMNS, CHUNK_SIZE, TEXT_COLUMN, open_source, peak_rss_mb
+from doc_store import DocumentStore, PackedTextStore, add_document_routes
+from export import EXPORT_CHUNK_ROWS, EXPORT_FORMATS, ExportStore, add_export_routes
+from name_index import best_scores
+from metrics import ROW_BUCKETS, MetricsRegistry, SlowQueryProfiler, StageTimer, add_metrics_route
+from query_cache import QueryCache
+from ranking import bm25_top_k
+from result_cursors import ResultCursors
+from search_index import InvertedIndex, sorted_unique
+from semantic import CorpusFingerprint, SemanticIndex
+from snapshot import SnapshotError, read_manifest, write_snapshot
+
+# Where the semantic search vectors are stored (memory-mapped at load)
+SEMANTIC_INDEX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "semantic_index")
+# Sentence embedding model for semantic search; None uses the built-in
+# TF-IDF/LSA encoder, which needs no model download
+SEMANTIC_MODEL = None
+# Maximum number of ranked results returned by a semantic search
+SEMANTIC_TOP_K = 1000
+# Maximum number of results of a ranked (BM25) search, and the weight of
+# each field in its scores
+RANKED_TOP_K = 1000
+FIELD_BOOSTS = {"Case Title": 2.0, "Judgement Text": 1.0}
+# With "Prefer recent judgements", up to this fraction of a ranked score
+# depends on the decision date, halving every RECENCY_HALF_LIFE_DAYS
+RECENCY_WEIGHT = 0.3
+RECENCY_HALF_LIFE_DAYS = 3 * 365
+# Results shown per page of the results table
+PAGE_SIZE = 100
+# Slow searches first show the matches among this many rows, while the
+# search over every row runs
+PREVIEW_ROWS = 10000
+# Number of search worker processes; 0 runs searches in the Gradio worker
+# threads. Workers share the case table and indexes memory-mapped from the
+# snapshot in INDEX_DIR.
+SEARCH_WORKERS = int(os.environ.get("CASEPRISM_SEARCH_WORKERS", "0"))
+# Searches allowed to run at once; more wait in the Gradio queue
+SEARCH_CONCURRENCY = SEARCH_WORKERS or 2
+# Snapshot of the case table, judgement texts and every search index, written
+# by "python gradio-caseprism-ui.py --build-snapshot" (or when search workers
+# start) and memory-mapped at startup if it was built from the same source
+INDEX_DIR = os.environ.get("CASEPRISM_INDEX_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "case_index"))
+# Whether startup checksums every byte of the snapshot. Off by default: it
+# reads the whole snapshot before the first search, where the version, source
+# and file size checks read nothing. "--verify-snapshot" runs the full check
+# on its own, e.g. after a deploy.
+VERIFY_SNAPSHOT = bool(int(os.environ.get("CASEPRISM_VERIFY_SNAPSHOT", "0")))
+# Case records are loaded from this Parquet or SQLite file; dummy records are
+# generated when it is not set
+DATA_SOURCE = os.environ.get("CASEPRISM_DATA")
+# Number of dummy records and the seed they are generated from (random when
+# not set)
+NUM_RECORDS = int(os.environ.get("CASEPRISM_RECORDS", "1500"))
+SEED = int(os.environ["CASEPRISM_SEED"]) if os.environ.get("CASEPRISM_SEED") else None
+# Searches slower than this many seconds are profiled and their stack
+# samples written to SLOW_QUERY_DIR; profiling is off when not set
+SLOW_QUERY_SECONDS = float(os.environ["CASEPRISM_SLOW_QUERY_SECONDS"]) if os.environ.get("CASEPRISM_SLOW_QUERY_SECONDS") else None
+SLOW_QUERY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "slow_queries")
+# Judgement PDFs, named by the file name in each case's "PDF Link" and served
+# from /judgements/<name>
+PDF_DIR = os.environ.get("CASEPRISM_PDF_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "pdfs"))
+
+# Inverted indexes over the searchable text columns, keyed by column name.
+# Row ids are the positions of the rows in the case store.
+text_indexes = {"Case Title": InvertedIndex(), "Judgement Text": InvertedIndex()}
+
+# Reporter citations of the cases and the citation graph between them
+citation_index = CitationIndex()
+
+# Maximum number of related cases listed in each section of the case viewer
+RELATED_CASES_SHOWN = 10
+
+def build_text_indexes(row_ids, frame):
+    for column, index in text_indexes.items():
+        index.add_many(row_ids, frame[column])
+    # Citations are extracted while the judgement text is at hand
+    reported_as = frame["Citation"] if "Citation" in frame else [None] * len(frame)
+    citation_index.add(row_ids, reported_as, frame[TEXT_COLUMN])
+
+# Stream the source chunk by chunk into the text indexes and a compact
+# columnar case table; judgement text stays in the source's text store. The
+# documents semantic search embeds are added to fingerprint on the way.
+def load_cases(source, fingerprint):
+    frames = []
+    num_rows = 0
+    for chunk in source.chunks():
+        row_ids = np.arange(num_rows, num_rows + len(chunk))
+        num_rows += len(chunk)
+        build_text_indexes(row_ids, chunk)
+        fingerprint.update(semantic_documents(chunk))
+        frames.append(CaseStore.compact(chunk.drop(columns=[TEXT_COLUMN])))
+    return CaseStore.from_frames(frames)
+
+# Semantic search embeds the case title together with the judgement text
+def semantic_documents(frame):
+    return (frame["Case Title"].astype(str) + ". " + frame[TEXT_COLUMN].astype(str)).tolist()
+
+# The same documents for the loaded cases, fetched one slice at a time
+class CaseDocuments:
+    def __len__(self):
+        return len(cases)
     
-    case_types = ["Criminal Appeal", "Civil Appeal", "Special Leave Petition", "Writ Petition", 
-                  "Review Petition", "Curative Petition", "Transfer Petition", "Original Suit"]
+    def __getitem__(self, rows):
+        rows = np.arange(len(cases))[rows]
+        titles = cases.column("Case Title", rows).astype(str).tolist()
+        return [f"{title}. {text}" for title, text in zip(titles, judgement_texts.get(rows))]
+
+# The data source, case table, judgement texts, semantic index and judgement
+# documents, set by load_data
+source = None
+cases = None
+judgement_texts = None
+semantic_index = None
+documents = None
+# Manifest of the snapshot the data was opened from, None when it was loaded
+# from the source
+snapshot = None
+
+# What the data is loaded from, recorded in snapshots to tell whether one
+# holds the same cases
+def source_info():
+    if DATA_SOURCE:
+        stat = os.stat(DATA_SOURCE)
+        described = {"path": os.path.abspath(DATA_SOURCE), "bytes": stat.st_size, "modified": stat.st_mtime}
+    else:
+        described = {"records": NUM_RECORDS, "seed": SEED}
+    return {"source": described, "semantic_model": SEMANTIC_MODEL}
+
+# Open the snapshot in directory, every part memory-mapped; raises
+# SnapshotError if it is missing, of another version, corrupt (when verify is
+# set) or built from another source
+def open_snapshot(directory, verify=True):
+    global cases, judgement_texts, citation_index, semantic_index, documents, snapshot
+    manifest = read_manifest(directory, verify)
+    built_from = dict(manifest["source"])
+    if not DATA_SOURCE and SEED is None:
+        # Any generated records will do when no seed is set
+        built_from["seed"] = None
+    if {"source": built_from, "semantic_model": manifest["semantic_model"]} != source_info():
+        raise SnapshotError(f"snapshot built from {manifest['source']}, not the configured source")
+    loaded_indexes = {column: InvertedIndex.load(os.path.join(directory, "text_index", column.lower().replace(" ", "_")))
+                      for column in text_indexes}
+    cases = CaseStore.load(os.path.join(directory, "cases"))
+    text_indexes.update(loaded_indexes)
+    citation_index = CitationIndex.load(os.path.join(directory, "citations"))
+    judgement_texts = PackedTextStore(os.path.join(directory, "texts", "judgements"))
+    semantic_index = SemanticIndex.load(os.path.join(directory, "semantic"))
+    documents = DocumentStore(judgement_texts, PDF_DIR)
+    snapshot = manifest
+
+# Every judgement text in row order, read a chunk at a time from whichever
+# text store holds them
+def all_judgement_texts():
+    for start in range(0, len(judgement_texts), CHUNK_SIZE):
+        yield from judgement_texts.get(np.arange(start, min(start + CHUNK_SIZE, len(judgement_texts))))
+
+# Write the case table, text indexes, citation index, judgement texts and
+# semantic index to a snapshot in directory
+def save_snapshot(directory):
+    def write(path):
+        cases.save(os.path.join(path, "cases"))
+        for column, index in text_indexes.items():
+            index.save(os.path.join(path, "text_index", column.lower().replace(" ", "_")))
+        citation_index.save(os.path.join(path, "citations"))
+        PackedTextStore.write(os.path.join(path, "texts", "judgements"), all_judgement_texts())
+        semantic_index.save(os.path.join(path, "semantic"))
+    return write_snapshot(directory, write, {**source_info(), "rows": len(cases)})
+
+# Open the snapshot in INDEX_DIR or, when there is no usable one (or
+# use_snapshot is False), load the cases from the source and build the
+# indexes. Called at startup rather than on import, so importing this module
+# stays cheap.
+def load_data(use_snapshot=True):
+    global source, cases, judgement_texts, semantic_index, documents
+    load_started = time.perf_counter()
+    source = open_source(DATA_SOURCE, NUM_RECORDS, SEED)
+    if use_snapshot:
+        try:
+            open_snapshot(INDEX_DIR, verify=VERIFY_SNAPSHOT)
+        except SnapshotError as e:
+            print(f"Loading from {source}: {e}")
+    if snapshot is not None:
+        loaded_from = f"the snapshot in {INDEX_DIR}"
+    else:
+        judgement_texts = source.texts
+        fingerprint = CorpusFingerprint()
+        cases = load_cases(source, fingerprint)
+        semantic_index = SemanticIndex.open_or_build(
+            SEMANTIC_INDEX_DIR, CaseDocuments(), len(cases), fingerprint.hexdigest(), SEMANTIC_MODEL
+        )
+        documents = DocumentStore(judgement_texts, PDF_DIR)
+        loaded_from = str(source)
+    print(f"Loaded {len(cases)} cases from {loaded_from} in {time.perf_counter() - load_started:.1f}s "
+          f"(peak RSS {peak_rss_mb():.0f} MB)")
+
+# Write the snapshot and reopen everything from it memory-mapped, so forked
+# search workers share one read-only copy through the page cache instead of
+# each holding their own
+def share_indexes():
+    save_snapshot(INDEX_DIR)
+    open_snapshot(INDEX_DIR, verify=False)
+
+# Pool of forked search worker processes, None when searching in-process
+search_pool = None
+
+def start_search_pool(workers):
+    global search_pool
+    search_pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("fork"))
+    # Fork every worker now, before the server starts its threads
+    search_pool.submit(int).result()
+
+# Append new records to the case table and index them
+def add_cases(records):
+    global search_pool
+    if search_pool is not None:
+        # Workers hold the data as it was when they were forked
+        print("Search workers stopped: records were added, searching in-process from now on")
+        search_pool.shutdown()
+        search_pool = None
+    new_df = pd.DataFrame(records)
+    row_ids = cases.append(new_df.drop(columns=[TEXT_COLUMN]))
+    judgement_texts.append(new_df[TEXT_COLUMN].tolist())
+    build_text_indexes(row_ids, new_df)
+    semantic_index.add(semantic_documents(new_df))
+    return row_ids
+
+# Result sets of the current searches, referenced from each session's state
+result_cursors = ResultCursors()
+
+# Columns shown in the results table
+DISPLAY_COLUMNS = ["Court", "Judge", "Case Title", "Case Type", "Case No", "Year", "Decision Date", "Disposal Nature", "Stage"]
+
+# A stored date in the "%d-%m-%Y" form of the case records, "" for cases
+# without one (NaT)
+def format_date(value):
+    return "" if pd.isna(value) else value.strftime("%d-%m-%Y")
+
+# A stored text value for display, "" for a missing one (None or NaN)
+def format_text(value):
+    return "" if pd.isna(value) else value
+
+# Table rows and page label for one page of a result set
+def results_page(rows, page):
+    page_rows = rows[page * PAGE_SIZE:(page + 1) * PAGE_SIZE]
+    display_data = cases.take(page_rows, [column for column in DISPLAY_COLUMNS if column in cases.columns])
+    # Dates are stored as datetime64, format them back for display
+    if "Decision Date" in display_data:
+        display_data = display_data.assign(**{"Decision Date": display_data["Decision Date"].map(format_date)})
+    # Columns the source lacks are shown empty
+    display_data = display_data.reindex(columns=DISPLAY_COLUMNS, fill_value="")
+    num_pages = max(1, -(-len(rows) // PAGE_SIZE))
+    return display_data, f"Page {page + 1} of {num_pages}"
+
+# Columns that can be exported, in record order
+def exportable_columns():
+    return [column for column in CASE_COLUMNS if column in cases.columns or column == TEXT_COLUMN]
+
+# Exported result files, served from /exports/<name>
+exports = ExportStore()
+
+# The given columns of rows, as DataFrames of at most EXPORT_CHUNK_ROWS rows.
+# Judgement text is only read when it is one of the columns. Empty results
+# still give one (empty) chunk, so the file has its header.
+def export_chunks(rows, columns):
+    for start in range(0, max(len(rows), 1), EXPORT_CHUNK_ROWS):
+        chunk = rows[start:start + EXPORT_CHUNK_ROWS]
+        frame = cases.take(chunk, [column for column in columns if column != TEXT_COLUMN])
+        if TEXT_COLUMN in columns:
+            frame[TEXT_COLUMN] = judgement_texts.get(chunk)
+        yield frame[columns]
+
+# Columns counted over every result set, and how many values of each the
+# facet panel lists
+FACET_COLUMNS = ["Court", "Bench", "Judge", "Case Type", "Disposal Nature", "Stage", "Year"]
+FACET_PANEL_VALUES = 8
+
+# Dropdown filters: the column each filters on and the choice meaning "not
+# filtered", which is listed first
+DROPDOWN_PLACEHOLDERS = {"Court": "ALL", "Bench": "Select Bench", "Case Type": "Select Case Subject",
+                         "Disposal Nature": "Select Disposal Nature"}
+
+# Choices of a dropdown filter; with facet counts (from CaseStore.facets),
+# each value is labelled with its number of results
+def dropdown_choices(column, counts=None):
+    if counts is None:
+        return [DROPDOWN_PLACEHOLDERS[column]] + cases.values(column)
+    return [DROPDOWN_PLACEHOLDERS[column]] + [(f"{value} ({count:,})", value) for value, count in counts.items()]
+
+# Markdown listing the most common values of each facet column
+def facet_panel(counts):
+    lines = []
+    for column in FACET_COLUMNS:
+        top = counts[column][counts[column] > 0].sort_values(ascending=False, kind="stable")[:FACET_PANEL_VALUES]
+        if len(top):
+            lines.append(f"**{column}:** " + " · ".join(f"{value} ({count:,})" for value, count in top.items()))
+    return "\n\n".join(lines)
+
+# Text of a searchable column for the given rows; judgement text is read
+# from the text store rather than the case table
+def column_text(column, rows):
+    if column == TEXT_COLUMN:
+        return pd.Series(judgement_texts.get(rows), index=rows)
+    return cases.column(column, rows)
+
+# Row ids (a subset of rows, None for every row) whose column contains term,
+# resolved through the inverted index. Only candidate rows that the index
+# cannot confirm on its own are re-checked with the matches predicate.
+def rows_containing(rows, column, term, matches, literal=True):
+    candidates, exact = text_indexes[column].candidates(term, literal=literal)
+    if candidates is not None:
+        rows = candidates if rows is None else np.intersect1d(candidates, rows, assume_unique=True)
+    else:
+        rows = row_ids(rows)
+    if not exact and len(rows):
+        rows = rows[matches(column_text(column, rows)).to_numpy(dtype=bool)]
+    return rows
+
+# Case-insensitive substring match of a single word, as in the original scan
+def word_matcher(word):
+    word = word.lower()
+    return lambda texts: texts.apply(lambda text: word in text.lower())
+
+# Row ids (a subset of rows, None for every row) with a name in any of the
+# columns matching query, allowing typos, and the best similarity of each
+# row's names
+def rows_matching_name(rows, columns, query):
+    matched = []
+    scores = []
+    for column in columns:
+        if column in cases.columns:
+            index = cases.name_index(column)
+            column_rows, column_scores = index.scored_rows(*index.match(query))
+            matched.append(column_rows)
+            scores.append(column_scores)
+    if not matched:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    matched, scores = best_scores(np.concatenate(matched), np.concatenate(scores))
+    if rows is None:
+        return matched, scores
+    rows, _, found = np.intersect1d(rows, matched, assume_unique=True, return_indices=True)
+    return rows, scores[found]
+
+# Score weights of rows for ranked search, between 1 - RECENCY_WEIGHT for
+# old (or undated) decisions and 1 for today's
+def recency_weights(rows):
+    dates = cases.columns["Decision Date"][rows]
+    age = (np.datetime64("today") - dates) / np.timedelta64(1, "D")
+    decay = 0.5 ** (np.maximum(age, 0) / RECENCY_HALF_LIFE_DAYS)
+    decay[np.isnat(dates)] = 0
+    return 1 - RECENCY_WEIGHT + RECENCY_WEIGHT * decay
+
+# HTML sections of the case viewer listing the cases a judgement cites and
+# the cases citing it, read from the citation graph, most recent first
+def related_cases_html(row_id):
+    cited, unresolved, citing = citation_index.related(row_id)
+    sections = []
+    for heading, rows, others in (("Cases cited", cited, unresolved), ("Cited by", citing, [])):
+        if not len(rows) and not others:
+            continue
+        dates = cases.columns["Decision Date"][rows]
+        rows = rows[np.lexsort((dates, ~np.isnat(dates)))[::-1]]
+        items = [f"<li>{case['Case Title']} ({format_text(case.get('Citation'))}), {case['Court']}, "
+                 f"{format_date(case['Decision Date'])}</li>"
+                 for _, case in cases.take(rows[:RELATED_CASES_SHOWN]).iterrows()]
+        items += [f"<li>{other}</li>" for other in others[:RELATED_CASES_SHOWN]]
+        sections.append(f"<p><strong>{heading} ({len(rows) + len(others)}):</strong></p><ul>{''.join(items)}</ul>")
+    return "".join(sections)
+
+# Date bounds (start, end) for a "Past ..." or "Custom range" filter, either
+# bound may be None; None when the filter does not restrict dates
+def date_filter_bounds(time_filter, date_range):
+    if not time_filter or time_filter == "ALL":
+        return None
+    today = datetime.now()
+    if time_filter == "Past Week":
+        return today - timedelta(days=7), None
+    elif time_filter == "Past Month":
+        return today - timedelta(days=30), None
+    elif time_filter == "Past Year":
+        return today - timedelta(days=365), None
+    elif time_filter == "Custom range" and date_range and len(date_range) == 2:
+        try:
+            return (datetime.strptime(date_range[0], "%Y-%m-%d"),
+                    datetime.strptime(date_range[1], "%Y-%m-%d"))
+        except (ValueError, TypeError):
+            # If date parsing fails, leave the dates unfiltered
+            return None
+    return None
+
+# Search metrics of this process, served from /metrics. Stage timings of
+# searches run in worker processes are sent back and recorded here.
+metrics = MetricsRegistry()
+stage_seconds = metrics.histogram("caseprism_search_stage_seconds", "Time spent in each stage of a search", ["stage"])
+stage_rows_in = metrics.histogram("caseprism_search_stage_rows_in", "Candidate rows entering each stage of a search",
+                                  ["stage"], ROW_BUCKETS)
+stage_rows_out = metrics.histogram("caseprism_search_stage_rows_out", "Rows left after each stage of a search",
+                                   ["stage"], ROW_BUCKETS)
+search_seconds = metrics.histogram("caseprism_search_seconds", "Time to find the rows of a search, by result cache outcome",
+                                   ["cache"])
+search_results = metrics.histogram("caseprism_search_results", "Rows matched by a search", buckets=ROW_BUCKETS)
+first_rows_seconds = metrics.histogram("caseprism_search_first_rows_seconds",
+                                       "Time from a search click to its first page of results, by whether it was a preview",
+                                       ["stage"])
+startup_seconds = metrics.gauge("caseprism_startup_seconds",
+                                "Time from process start to each startup step: modules imported, data loaded, "
+                                "interface built, first search served", ["step"])
+# Hits, misses and refinements are counted by caseprism_search_seconds
+query_cache_size = metrics.gauge("caseprism_query_cache_size", "Results held by the search result cache, "
+                                 "in entries and in bytes", ["unit"])
+slow_query_profiler = SlowQueryProfiler(SLOW_QUERY_SECONDS, SLOW_QUERY_DIR)
+
+# Record the time from process start to a startup step
+def startup_step(step):
+    seconds = time.perf_counter() - STARTED
+    startup_seconds.set(seconds, step)
+    print(f"Startup: {step.replace('_', ' ')} after {seconds:.1f}s")
+
+# Whether the first search since startup has shown its results
+first_search_served = False
+
+def search_served():
+    global first_search_served
+    if not first_search_served:
+        first_search_served = True
+        startup_step("first_search_served")
+
+# Record (stage, seconds, rows in, rows out) tuples from a StageTimer
+def record_stages(stages):
+    for stage, seconds, rows_in, rows_out in stages:
+        stage_seconds.observe(seconds, stage)
+        stage_rows_in.observe(rows_in, stage)
+        stage_rows_out.observe(rows_out, stage)
+
+# Number of rows in a candidate set, where None stands for every row
+def row_count(rows):
+    return len(cases) if rows is None else len(rows)
+
+# Row ids of a candidate set, where None stands for every row
+def row_ids(rows):
+    return np.arange(len(cases)) if rows is None else rows
+
+# Function to filter data based on inputs, returning the matching rows
+def filter_data(*args, **kwargs):
+    rows = filter_rows(*args, **kwargs)
+    timer = StageTimer()
+    frame = cases.take(rows)
+    timer.mark("take", len(rows), len(frame))
+    record_stages(timer.stages)
+    return frame
+
+# Values of each filter that mean "not filtered"
+FILTER_PLACEHOLDERS = {
+    "court": {"ALL", "Select Court"},
+    "bench": {"Select Bench"},
+    "case_type": {"Select Case Subject"},
+    "disposal_nature": {"Select Disposal Nature"},
+}
+
+# Normalized, hashable form of the filter_rows arguments: the sorted
+# (name, value) pairs of the filters that are actually applied. Relative
+# date filters are keyed by today's date, since their results change at
+# day boundaries.
+def query_key(court, bench, judge, act_section, decision_date_range, search_text, search_type, time_filter, 
+              case_type, case_no, year, party, disposal_nature, search_method,
+              registration_time_filter=None, registration_date_range=None, lawyer=None, recency=False,
+              legal_terms=None, citation=None):
+    filters = {"court": court, "bench": bench, "judge": judge, "act_section": act_section, "case_type": case_type,
+               "case_no": case_no, "year": year, "party": party, "disposal_nature": disposal_nature, "lawyer": lawyer,
+               "legal_terms": legal_terms, "citation": citation}
+    today = datetime.now().date().isoformat()
+    for name, time_filter, date_range in (("decision_date", time_filter, decision_date_range),
+                                          ("registration_date", registration_time_filter, registration_date_range)):
+        bounds = date_filter_bounds(time_filter, date_range)
+        if bounds:
+            filters[name] = bounds if time_filter == "Custom range" else (time_filter, today)
+    if search_text:
+        if search_method == "Exact Match":
+            filters["text"] = ("exact", search_type, search_text)
+        elif search_method == "Ranked":
+            filters["text"] = ("ranked", search_text, bool(recency))
+        else:
+            filters["text"] = ("semantic", search_text)
+    return tuple(sorted((name, value) for name, value in filters.items()
+                        if value and value not in FILTER_PLACEHOLDERS.get(name, ())))
+
+# Recent results, keyed by query_key
+query_cache = QueryCache()
+
+# Cancellation flags of the searches started from the interface, one slot
+# per search allowed to run at once. Created before the search workers
+# fork, so that they share them.
+search_cancel_flags = CancelFlags(SEARCH_CONCURRENCY)
+
+# Row ids of the cases matching the inputs, in result order. Repeated
+# queries are served from the cache and narrower ones refined from a cached
+# superset. With a cancel_slot, the search raises SearchCancelled after the
+# filter it is in once the slot is cancelled.
+def filter_rows(*args, cancel_slot=None, **kwargs):
+    started = time.perf_counter()
+    key = query_key(*args, **kwargs)
+    version = cases.version
+    rows = query_cache.get(key, version)
+    outcome = "hit"
+    if rows is None:
+        within = query_cache.find_superset(key, version)
+        outcome = "miss" if within is None else "refined"
+        rows, stages = run_search(*args, within=within, cancel_slot=cancel_slot, **kwargs)
+        record_stages(stages)
+        # Ranked and semantic results are the top k, not every match
+        refinable = dict(key).get("text", ("exact",))[0] == "exact"
+        query_cache.put(key, rows, version, refinable=refinable)
+        cache_stats = query_cache.stats()
+        query_cache_size.set(cache_stats["entries"], "entries")
+        query_cache_size.set(cache_stats["bytes"], "bytes")
+    search_seconds.observe(time.perf_counter() - started, outcome)
+    search_results.observe(len(rows))
+    return rows
+
+# Results of a search in stages, as (rows, complete) pairs. Text searches
+# that are not cached first yield the matches among the first PREVIEW_ROWS
+# row ids: their first page is already the final one unless the results are
+# ranked, and their count gives an estimate of the total. The last stage has
+# every match.
+def search_stages(*args, cancel_slot=None, **kwargs):
+    key = query_key(*args, **kwargs)
+    filters = dict(key)
+    if (len(cases) > PREVIEW_ROWS and ("text" in filters or "legal_terms" in filters)
+            and not query_cache.contains(key, cases.version)):
+        rows, stages = run_search(*args, within=np.arange(PREVIEW_ROWS), cancel_slot=cancel_slot, **kwargs)
+        record_stages(stages)
+        yield rows, False
+    yield filter_rows(*args, cancel_slot=cancel_slot, **kwargs), True
+
+# Run the filters in a search worker when serving with a worker pool
+def run_search(*args, **kwargs):
+    if search_pool is None:
+        return timed_filters(*args, **kwargs)
+    return search_pool.submit(timed_filters, *args, **kwargs).result()
+
+# Run the filters, returning the rows and the stage timings; slow searches
+# are profiled when SLOW_QUERY_SECONDS is set. A cancelled search stops
+# before its first filter or after the one it is in.
+def timed_filters(*args, within=None, cancel_slot=None, **kwargs):
+    search_cancel_flags.check(cancel_slot)
+    timer = StageTimer(check=lambda: search_cancel_flags.check(cancel_slot))
+    with slow_query_profiler.track(query_key(*args, **kwargs)):
+        rows = run_filters(*args, within=within, timer=timer, **kwargs)
+    return rows, timer.stages
+
+# Apply the filters, only to the rows in within when given. Each applied
+# filter marks a stage on timer with the row counts before and after it.
+# Judge, party and lawyer names match allowing typos, and results of a name
+# search are ranked by how closely the names match. A citation matches the
+# cases reported as it and the cases citing it, the former listed first.
+def run_filters(court, bench, judge, act_section, decision_date_range, search_text, search_type, time_filter, 
+                case_type, case_no, year, party, disposal_nature, search_method,
+                registration_time_filter=None, registration_date_range=None, lawyer=None, recency=False,
+                legal_terms=None, citation=None, within=None, timer=None):
+    timer = timer or StageTimer()
     
-    disposal_types = ["Disposed", "Pending", "Dismissed", "Allowed", "Partly Allowed", "Withdrawn", "Admission Stage"]
+    # Apply date filters first: each is a binary search over a sorted date
+    # index, and every later filter only looks at the resulting slice
+    rows = within
+    for column, bounds in (("Decision Date", date_filter_bounds(time_filter, decision_date_range)),
+                           ("Registration Date", date_filter_bounds(registration_time_filter, registration_date_range))):
+        if bounds:
+            rows_in = row_count(rows)
+            date_rows = cases.date_range(column, *bounds)
+            rows = date_rows if rows is None else np.intersect1d(rows, date_rows, assume_unique=True)
+            timer.mark(column.lower().replace(" ", "_"), rows_in, len(rows))
     
-    stages = ["ADMISSION STAGE", "HEARING STAGE", "FINAL STAGE", "DISPOSED"]
+    # Equality filters are answered by AND-ing the precomputed bitmaps
+    bitmaps = []
     
-    benches = ["Principal Bench", "Aurangabad Bench", "Nagpur Bench", "Delhi Bench", "Lucknow Bench"]
+    # Apply court filter
+    if court and court != "ALL" and court != "Select Court":
+        bitmaps.append(cases.bitmap("Court", court))
     
-    petitioners = ["State of Maharashtra", "Union of India", "Income Tax Department", "Bharti Airtel Ltd.",
-                  "Tata Motors", "Reliance Industries", "Mukesh Ambani", "Ratan Tata", "Common Cause", 
-                  "People's Union for Civil Liberties"]
+    # Apply bench filter
+    if bench and bench != "Select Bench":
+        bitmaps.append(cases.bitmap("Bench", bench))
     
-    respondents = ["Union of India", "State of Maharashtra", "Municipal Corporation of Delhi", "Vijay Mallya",
-                  "Central Bureau of Investigation", "Enforcement Directorate", "Reserve Bank of India",
-                  "Election Commission of India", "Securities and Exchange Board of India"]
+    # Apply case type filter
+    if case_type and case_type != "Select Case Subject":
+        bitmaps.append(cases.bitmap("Case Type", case_type))
     
-    # Generate random dates for the past 5 years
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=5*365)
+    # Apply year filter
+    if year:
+        bitmaps.append(cases.bitmap("Year", year))
     
-    data = []
-    for i in range(num_records):
-        court = random.choice(courts)
-        judge = random.choice(judges)
-        act = random.choice(acts)
-        section = random.choice(sections)
-        case_type = random.choice(case_types)
-        case_no = random.randint(1, 9999)
-        year = random.randint(2010, 2025)
-        random_days = random.randint(0, (end_date - start_date).days)
-        decision_date = start_date + timedelta(days=random_days)
-        
-        # Format date as string
-        decision_date_str = decision_date.strftime("%d-%m-%Y")
-        
-        petitioner = random.choice(petitioners)
-        respondent = random.choice(respondents)
-        disposal_nature = random.choice(disposal_types)
-        stage = random.choice(stages)
-        bench = random.choice(benches)
-        
-        # Generate dummy case title
-        case_title = f"{petitioner} vs {respondent}"
-        
-        # Generate some dummy text for judgement
-        judgement_text = f"In the matter of {case_title}, the {court} has considered the arguments presented by both parties. The case pertains to {act} {section}. After due consideration, the court has decided to {disposal_nature.lower()} the petition."
-        
-        # Generate a dummy PDF link for the judgement
-        # In a real application, these would be actual links to stored PDFs
-        # pdf_link = f"https://judgements.ecourts.gov.in/pdfs/{court.lower().replace(' ', '_')}/{year}/{case_no}.pdf"
-        pdf_link = "/home/shiva_123/case-prizm-frontend/43b7fbcdfaf949adb92e8553b0e8c50d849b113f8272b939420035696feeb31d1746440594.pdf"
-        
-        data.append({
-            "Court": court,
-            "Judge": judge,
-            "Act": act,
-            "Section": section,
-            "Decision Date": decision_date_str,
-            "Case Type": case_type,
-            "Case No": case_no,
-            "Year": year,
-            "Petitioner": petitioner,
-            "Respondent": respondent,
-            "Disposal Nature": disposal_nature,
-            "Case Title": case_title,
-            "Judgement Text": judgement_text,
-            "Stage": stage,
-            "Bench": bench,
-            "PDF Link": pdf_link
-        })
+    # Apply disposal nature filter
+    if disposal_nature and disposal_nature != "Select Disposal Nature":
+        bitmaps.append(cases.bitmap("Disposal Nature", disposal_nature))
     
-    return pd.DataFrame(data)
-
-# Create dummy data
-df = generate_dummy_data(1500)
-
-# Function to filter data based on inputs
-def filter_data(court, bench, judge, act_section, decision_date_range, search_text, search_type, time_filter, 
-                case_type, case_no, year, party, disposal_nature, search_method):
-    filtered_df = df.copy()
+    rows_in = row_count(rows)
+    rows = cases.select(bitmaps, rows)
+    if bitmaps:
+        timer.mark("bitmaps", rows_in, len(rows))
     
-    # Apply court filter
-    if court and court != "ALL" and court != "Select Court":
-        filtered_df = filtered_df[filtered_df["Court"] == court]
+    # Apply citation filter: hash lookups of the citations, then the rows
+    # adjacent to them in the citation graph
+    reported = None
+    if citation:
+        rows_in = row_count(rows)
+        citation_ids = citation_index.lookup(citation)
+        reported = citation_index.reported_rows(citation_ids)
+        cited = np.union1d(reported, citation_index.citing_rows(citation_ids))
+        rows = cited if rows is None else np.intersect1d(rows, cited, assume_unique=True)
+        timer.mark("citation", rows_in, len(rows))
     
-    # Apply bench filter
-    if bench and bench != "Select Bench":
-        filtered_df = filtered_df[filtered_df["Bench"] == bench]
+    # Name filters, each giving (matched rows, similarity) for the ranking
+    name_scores = []
     
     # Apply judge filter
     if judge:
-        filtered_df = filtered_df[filtered_df["Judge"].str.contains(judge, case=False)]
+        rows_in = row_count(rows)
+        rows, scores = rows_matching_name(rows, ["Judge"], judge)
+        name_scores.append((rows, scores))
+        timer.mark("judge", rows_in, len(rows))
     
     # Apply act/section filter
     if act_section:
-        act_section_filter = (filtered_df["Act"].str.contains(act_section, case=False)) | \
-                            (filtered_df["Section"].str.contains(act_section, case=False))
-        filtered_df = filtered_df[act_section_filter]
-    
-    # Apply case type filter
-    if case_type and case_type != "Select Case Subject":
-        filtered_df = filtered_df[filtered_df["Case Type"] == case_type]
+        rows_in = row_count(rows)
+        rows = row_ids(rows)
+        rows = rows[cases.contains("Act", rows, act_section) | cases.contains("Section", rows, act_section)]
+        timer.mark("act_section", rows_in, len(rows))
     
     # Apply case number filter
     if case_no:
-        filtered_df = filtered_df[filtered_df["Case No"].astype(str).str.contains(case_no)]
-    
-    # Apply year filter
-    if year:
-        filtered_df = filtered_df[filtered_df["Year"].astype(str) == year]
+        rows_in = row_count(rows)
+        rows = row_ids(rows)
+        rows = rows[cases.contains("Case No", rows, case_no, case=True)]
+        timer.mark("case_no", rows_in, len(rows))
     
     # Apply party (petitioner/respondent) filter
     if party:
-        party_filter = (filtered_df["Petitioner"].str.contains(party, case=False)) | \
-                       (filtered_df["Respondent"].str.contains(party, case=False))
-        filtered_df = filtered_df[party_filter]
+        rows_in = row_count(rows)
+        rows, scores = rows_matching_name(rows, ["Petitioner", "Respondent"], party)
+        name_scores.append((rows, scores))
+        timer.mark("party", rows_in, len(rows))
     
-    # Apply disposal nature filter
-    if disposal_nature and disposal_nature != "Select Disposal Nature":
-        filtered_df = filtered_df[filtered_df["Disposal Nature"] == disposal_nature]
+    # Apply lawyer filter
+    if lawyer:
+        rows_in = row_count(rows)
+        rows, scores = rows_matching_name(rows, ["Lawyers"], lawyer)
+        name_scores.append((rows, scores))
+        timer.mark("lawyer", rows_in, len(rows))
     
-    # Apply date filter
-    if time_filter and time_filter != "ALL":
-        today = datetime.now()
-        if time_filter == "Past Week":
-            start_date = today - timedelta(days=7)
-        elif time_filter == "Past Month":
-            start_date = today - timedelta(days=30)
-        elif time_filter == "Past Year":
-            start_date = today - timedelta(days=365)
-        elif time_filter == "Custom range" and decision_date_range and len(decision_date_range) == 2:
-            try:
-                start_date = datetime.strptime(decision_date_range[0], "%Y-%m-%d")
-                end_date = datetime.strptime(decision_date_range[1], "%Y-%m-%d")
-                
-                # Convert the string dates in the dataframe to datetime objects
-                filtered_df["Decision Date"] = pd.to_datetime(filtered_df["Decision Date"], format="%d-%m-%Y")
-                filtered_df = filtered_df[(filtered_df["Decision Date"] >= start_date) & 
-                                         (filtered_df["Decision Date"] <= end_date)]
-                # Convert back to string format to avoid issues with displaying
-                filtered_df["Decision Date"] = filtered_df["Decision Date"].dt.strftime("%d-%m-%Y")
-            except (ValueError, TypeError):
-                # If date parsing fails, just return the current filtered dataframe
-                pass
-            return filtered_df
-        
-        try:
-            # Convert the string dates in the dataframe to datetime objects
-            filtered_df["Decision Date"] = pd.to_datetime(filtered_df["Decision Date"], format="%d-%m-%Y")
-            filtered_df = filtered_df[filtered_df["Decision Date"] >= start_date]
-            # Convert back to string format to avoid issues with displaying
-            filtered_df["Decision Date"] = filtered_df["Decision Date"].dt.strftime("%d-%m-%Y")
-        except (ValueError, TypeError):
-            # If date parsing fails, just return the current filtered dataframe
-            pass
+    # Apply legal terms filter: every comma-separated term must appear in the
+    # judgement
+    if legal_terms:
+        rows_in = row_count(rows)
+        for term in filter(None, (term.strip() for term in legal_terms.split(","))):
+            term_matcher = lambda texts, term=term: texts.str.contains(term, case=False, regex=False)
+            rows = rows_containing(rows, "Judgement Text", term, term_matcher)
+        timer.mark("legal_terms", rows_in, len(rows))
     
     # Apply text search
     if search_text:
         if search_method == "Exact Match":
             # Exact match search
             if search_type == "Phrase(s)":
-                # Search for exact phrase
-                text_filter = (filtered_df["Case Title"].str.contains(search_text, case=False)) | \
-                             (filtered_df["Judgement Text"].str.contains(search_text, case=False))
+                # Search for exact phrase in the title or the judgement
+                phrase_matcher = lambda texts: texts.str.contains(search_text, case=False)
+                text_rows = sorted_unique(np.concatenate([
+                    rows_containing(rows, "Case Title", search_text, phrase_matcher, literal=False),
+                    rows_containing(rows, "Judgement Text", search_text, phrase_matcher, literal=False)
+                ]))
             else:  # Any Words or All Words
                 # Split the search text into words
                 search_words = search_text.split()
+                word_rows = [rows_containing(rows, "Judgement Text", word, word_matcher(word))
+                             for word in search_words]
                 
                 if search_type == "Any Words":
                     # Match any of the words
-                    text_filter = filtered_df["Judgement Text"].apply(
-                        lambda text: any(word.lower() in text.lower() for word in search_words)
-                    )
+                    text_rows = sorted_unique(np.concatenate(word_rows)) if word_rows else np.empty(0, dtype=np.int64)
                 else:  # All Words
-                    # Match all of the words
-                    text_filter = filtered_df["Judgement Text"].apply(
-                        lambda text: all(word.lower() in text.lower() for word in search_words)
-                    )
-        else:  # Semantic Search - simple simulation for demo
-            # This is a simplified simulation of semantic search
-            # In a real application, you would use embeddings or NLP algorithms
-            relevant_terms = {
-                "murder": ["killing", "homicide", "death", "deceased", "weapon"],
-                "theft": ["stolen", "robbery", "burglary", "property", "took"],
-                "fraud": ["deception", "misrepresentation", "cheating", "false", "misleading"],
-                "corruption": ["bribe", "illegal gratification", "misconduct", "undue advantage"],
-                "constitution": ["fundamental rights", "directive principles", "amendment", "article"],
-                "divorce": ["marriage", "separation", "alimony", "matrimonial", "spouse"]
-            }
-            
-            # Expand search text with related terms
-            expanded_terms = set([search_text.lower()])
-            for term in search_text.lower().split():
-                if term in relevant_terms:
-                    expanded_terms.update(relevant_terms[term])
-            
-            # Search for any of the expanded terms
-            text_filter = filtered_df["Judgement Text"].apply(
-                lambda text: any(term.lower() in text.lower() for term in expanded_terms)
-            )
+                    # Match all of the words, starting from the first one's
+                    # rows (every row when there are no words)
+                    text_rows = word_rows[0] if word_rows else row_ids(rows)
+                    for matched in word_rows[1:]:
+                        text_rows = np.intersect1d(text_rows, matched, assume_unique=True)
+        elif search_method == "Ranked":
+            # Best BM25 matches of the title and judgement among the
+            # filtered rows (every row when nothing was filtered)
+            fields = [(text_indexes[column], boost) for column, boost in FIELD_BOOSTS.items()]
+            text_rows, _ = bm25_top_k(fields, search_text, RANKED_TOP_K, rows=rows if row_count(rows) < len(cases) else None,
+                                      row_weights=recency_weights if recency else None)
+        else:  # Semantic Search
+            # Rank the filtered rows by embedding similarity to the search text
+            text_rows, _ = semantic_index.search(search_text, k=SEMANTIC_TOP_K, rows=rows)
         
-        filtered_df = filtered_df[text_filter]
+        stage = {"Ranked": "ranked", "Semantic Search": "semantic"}.get(
+            search_method, search_type.lower().replace("(s)", "").replace(" ", "_"))
+        timer.mark(f"text_{stage}", row_count(rows), len(text_rows))
+        rows = text_rows
+    
+    # Rank by name similarity (summed over the name filters), unless the
+    # results are already ranked by text relevance
+    ranked = search_text and search_method != "Exact Match"
+    if name_scores and not ranked:
+        similarity = np.zeros(len(rows))
+        for matched, scores in name_scores:
+            similarity += scores[np.searchsorted(matched, rows)]
+        rows = rows[np.lexsort((rows, -similarity))]
+        timer.mark("rank_names", len(rows), len(rows))
+    elif reported is not None and not ranked:
+        # The cited judgement itself before the cases citing it
+        is_reported = np.isin(rows, reported)
+        rows = np.concatenate([rows[is_reported], rows[~is_reported]])
     
-    return filtered_df
+    return row_ids(rows)
 
-# Create the Gradio interface
+# Create the Gradio interface. Gradio is imported here rather than with the
+# other modules: it is the slowest import, and search workers forked before
+# the interface is built do not need it.
 def create_interface():
+    import gradio as gr
+    
     with gr.Blocks() as app:
         # Header
         with gr.Row():
@@ -238,18 +747,19 @@ def create_interface():
             
             with gr.Column(scale=3):
                 search_text = gr.Textbox(label="Search within case", placeholder="Enter search text")
-            # with gr.Column(scale=1):
-            #     search_type = gr.Radio(
-            #         choices=["Phrase(s)", "Any Words", "All Words"],
-            #         value="Phrase(s)",
-            #         label=""
-            #     )
+            with gr.Column(scale=1):
+                search_type = gr.Radio(
+                    choices=["Phrase(s)", "Any Words", "All Words"],
+                    value="Phrase(s)",
+                    label=""
+                )
             with gr.Column(scale=1):
                 search_method = gr.Radio(
-                    choices=["Exact Match", "Semantic Search"],
+                    choices=["Exact Match", "Ranked", "Semantic Search"],
                     value="Exact Match",
                     label="Search Method"
                 )
+                prefer_recent = gr.Checkbox(label="Prefer recent judgements", value=False)
         
         # Search method selection
         # with gr.Row():
@@ -267,7 +777,7 @@ def create_interface():
                     label="Date of Registeration"
                 )
                 # Use two separate date inputs
-                with gr.Column(visible=False) as date_range_container:
+                with gr.Column(visible=False) as registeration_date_range_container:
                     start_date_of_registeration = gr.Textbox(label="Start Date (YYYY-MM-DD)", placeholder="YYYY-MM-DD")
                     end_date_of_registeration = gr.Textbox(label="End Date (YYYY-MM-DD)", placeholder="YYYY-MM-DD")
 
@@ -275,7 +785,7 @@ def create_interface():
         with gr.Row():
             with gr.Column():
                 court_dropdown = gr.Dropdown(
-                    choices=["ALL"] + sorted(df["Court"].unique().tolist()),
+                    choices=dropdown_choices("Court"),
                     value="ALL",
                     label="Court"
                 )
@@ -307,15 +817,15 @@ def create_interface():
                     value="Bombay High Court",
                     label="Select Court"
                 )
-            # with gr.Row():
-            #     bench_dropdown = gr.Dropdown(
-            #         choices=["Select Bench", "Principal Bench", "Aurangabad Bench", "Nagpur Bench"],
-            #         value="Select Bench",
-            #         label="Select Bench"
-            #     )
+            with gr.Row():
+                bench_dropdown = gr.Dropdown(
+                    choices=dropdown_choices("Bench"),
+                    value="Select Bench",
+                    label="Select Bench"
+                )
             with gr.Row():
                 case_type_dropdown = gr.Dropdown(
-                    choices=["Select Case Subject"] + sorted(df["Case Type"].unique().tolist()),
+                    choices=dropdown_choices("Case Type"),
                     value="Select Case Subject",
                     label="Case Subject"
                 )
@@ -336,7 +846,7 @@ def create_interface():
                 party = gr.Textbox(label="Party", placeholder="Enter Petitioner / Respondent")
             with gr.Row():
                 disposal_dropdown = gr.Dropdown(
-                    choices=["Select Disposal Nature"] + sorted(df["Disposal Nature"].unique().tolist()),
+                    choices=dropdown_choices("Disposal Nature"),
                     value="Select Disposal Nature",
                     label="Disposal Nature"
                 )
@@ -346,29 +856,50 @@ def create_interface():
             # Left column for results
             with gr.Column(scale=3):
                 results_text = gr.Markdown("")
+                with gr.Accordion("Results by category", open=False):
+                    facets_text = gr.Markdown("")
                 results_table = gr.Dataframe(
-                    headers=["Court", "Judge", "Case Title", "Case Type", "Case No", "Year", "Decision Date", "Disposal Nature", "Stage"],
+                    headers=DISPLAY_COLUMNS,
                     interactive=True,  # Make the table interactive so users can click on rows
                     elem_id="results_table"
                 )
+                with gr.Row():
+                    previous_button = gr.Button("Previous", size="sm")
+                    page_text = gr.Markdown("")
+                    next_button = gr.Button("Next", size="sm")
+                with gr.Accordion("Export results", open=False):
+                    with gr.Row():
+                        export_format = gr.Radio(choices=list(EXPORT_FORMATS), value="CSV", label="Format")
+                        export_columns = gr.CheckboxGroup(
+                            choices=exportable_columns(),
+                            value=[column for column in exportable_columns() if column != TEXT_COLUMN],
+                            label="Columns"
+                        )
+                    export_button = gr.Button("Export", size="sm")
+                    export_text = gr.Markdown("")
             
             # Right column for PDF viewer
             with gr.Column(scale=2):
                 pdf_viewer = gr.HTML(value="<div>Select a case to view the judgement</div>", label="Judgement PDF")
         
 
-        # Store current search results
-        state = gr.State([])
+        # Current search results: the cursor id of the server-side result set
+        # and the page being shown
+        state = gr.State(None)
         
         # Handle custom date range visibility
         def update_date_range_visibility(choice):
             return gr.update(visible=(choice == "Custom range"))
         
         time_filter.change(update_date_range_visibility, inputs=time_filter, outputs=date_range_container)
+        date_of_registeration_time_filter.change(update_date_range_visibility, inputs=date_of_registeration_time_filter,
+                                                 outputs=registeration_date_range_container)
         
-        # Handle search button click
-        def search_cases(court, judge, act_section, time_filter, start_date, end_date, search_text, search_type, 
-                        search_method, selected_court, bench, case_type, case_no, year, party, disposal_nature):
+        # filter_rows arguments for the values of the search inputs
+        def search_filters(court, judge, act_section, time_filter, start_date, end_date, search_text, search_type, 
+                           search_method, selected_court, bench, case_type, case_no, year, party, disposal_nature,
+                           registration_time_filter, registration_start_date, registration_end_date, lawyer, recency,
+                           legal_terms, citation):
             # Use selected_court if specified in the accordion, otherwise use the main court dropdown
             court_to_use = selected_court if selected_court != "Select Court" else court
             
@@ -376,66 +907,197 @@ def create_interface():
             date_range = None
             if time_filter == "Custom range" and start_date and end_date:
                 date_range = [start_date, end_date]
+            registration_date_range = None
+            if registration_time_filter == "Custom range" and registration_start_date and registration_end_date:
+                registration_date_range = [registration_start_date, registration_end_date]
             
-            filtered_data = filter_data(
-                court_to_use, bench, judge, act_section, date_range, search_text, search_type, time_filter,
-                case_type, case_no, year, party, disposal_nature, search_method
-            )
-            
-            num_results = len(filtered_data)
-            
-            # Create the results text
-            results_message = f"About {num_results} results ({random.uniform(0.5, 3):.1f} seconds)"
-            
-            # Select only the columns we want to display
-            display_columns = ["Court", "Judge", "Case Title", "Case Type", "Case No", "Year", "Decision Date", "Disposal Nature", "Stage"]
-            display_data = filtered_data[display_columns].head(100)  # Limit to first 100 results
-            
-            # Store the full results (including PDF links) for later use when a row is clicked
-            full_results = filtered_data.to_dict('records')
-            
-            return results_message, display_data, full_results
+            return (court_to_use, bench, judge, act_section, date_range, search_text, search_type, time_filter,
+                    case_type, case_no, year, party, disposal_nature, search_method,
+                    registration_time_filter, registration_date_range, lawyer, recency, legal_terms, citation)
+        
+        # The search running in each browser session. A new search takes
+        # over from the session's previous one, which is cancelled and stops
+        # after the filter it is in, freeing its concurrency slot.
+        running_searches = {}
+        running_searches_lock = threading.Lock()
+        
+        # Handle search button click. Results stream in: slow searches first
+        # show a preview page and an estimated count, then the exact results,
+        # then the counts by category. Gradio passes the request in place of
+        # the first argument since it is annotated.
+        def search_cases(request: gr.Request, *inputs):
+            session = request.session_hash if request else None
+            with running_searches_lock:
+                previous = running_searches.get(session)
+                if previous is not None and previous["cancel_slot"] is not None:
+                    search_cancel_flags.cancel(previous["cancel_slot"])
+                search = running_searches[session] = {"cancel_slot": search_cancel_flags.acquire()}
+            started = time.perf_counter()
+            filters = search_filters(*inputs)
+            # "exact", "ranked" or "semantic" for text searches
+            text_method = dict(query_key(*filters)).get("text", (None,))[0]
+            stages = search_stages(*filters, cancel_slot=search["cancel_slot"])
+            first_page = True
+            # The preview's result set, dropped once the complete one replaces it
+            preview_cursor = None
+            try:
+                for rows, complete in stages:
+                    if running_searches.get(session) is not search:
+                        return
+                    
+                    # Keep the results server-side and show the first page
+                    timer = StageTimer()
+                    display_data, page_label = results_page(rows, 0)
+                    timer.mark("page", len(rows), len(display_data))
+                    state = {"cursor": result_cursors.create(rows), "page": 0}
+                    if preview_cursor is not None:
+                        result_cursors.discard(preview_cursor)
+                        preview_cursor = None
+                    if first_page:
+                        # Time to first row, the latency users notice
+                        first_rows_seconds.observe(time.perf_counter() - started, "complete" if complete else "preview")
+                        search_served()
+                        first_page = False
+                    
+                    if not complete:
+                        # Scale the preview's count up to every row; ranked
+                        # searches return at most their top k
+                        estimate = len(rows) * len(cases) // PREVIEW_ROWS
+                        if text_method in ("ranked", "semantic"):
+                            estimate = min(estimate, RANKED_TOP_K if text_method == "ranked" else SEMANTIC_TOP_K)
+                        record_stages(timer.stages)
+                        preview_cursor = state["cursor"]
+                        yield (f"About {estimate} results, still searching...", display_data, state, "Page 1",
+                               "", *(gr.update() for _ in DROPDOWN_PLACEHOLDERS))
+                        continue
+                    
+                    num_results = len(rows)
+                    results_message = f"About {num_results} results ({time.perf_counter() - started:.2f} seconds)"
+                    yield (results_message, display_data, state, page_label,
+                           gr.update(), *(gr.update() for _ in DROPDOWN_PLACEHOLDERS))
+                    if running_searches.get(session) is not search:
+                        return
+                    
+                    # Count the results by category, for the dropdown labels
+                    # and the facet panel
+                    counts = cases.facets(rows, FACET_COLUMNS)
+                    timer.mark("facets", num_results, num_results)
+                    record_stages(timer.stages)
+                    yield (gr.update(), gr.update(), gr.update(), gr.update(), facet_panel(counts),
+                           *(gr.update(choices=dropdown_choices(column, counts[column])) for column in DROPDOWN_PLACEHOLDERS))
+            except SearchCancelled:
+                return
+            finally:
+                stages.close()
+                if preview_cursor is not None:
+                    result_cursors.discard(preview_cursor)
+                with running_searches_lock:
+                    if running_searches.get(session) is search:
+                        del running_searches[session]
+                    if search["cancel_slot"] is not None:
+                        search_cancel_flags.release(search["cancel_slot"])
+        
+        search_inputs = [court_dropdown, judge_textbox, act_section, time_filter, start_date, end_date, 
+                         search_text, search_type, search_method, selected_court, bench_dropdown,
+                         case_type_dropdown, case_no, year, party, disposal_dropdown,
+                         date_of_registeration_time_filter, start_date_of_registeration, end_date_of_registeration,
+                         lawyers, prefer_recent, legal_terms, citations]
         
         search_button.click(
             search_cases,
-            inputs=[court_dropdown, judge_textbox, act_section, time_filter, start_date, end_date, 
-                   search_text,  search_method,   
-                   case_type_dropdown, case_no, year, party, disposal_dropdown],
-            outputs=[results_text, results_table, state]
+            inputs=search_inputs,
+            outputs=[results_text, results_table, state, page_text, facets_text,
+                     court_dropdown, bench_dropdown, case_type_dropdown, disposal_dropdown],
+            concurrency_limit=SEARCH_CONCURRENCY,
+            # A click while a search is running starts a new one, which takes
+            # over from it
+            trigger_mode="multiple"
+        )
+        
+        # Handle export button click: write every result of the current
+        # search to a file, chunk by chunk, and link to it
+        def export_results(file_format, columns, progress=gr.Progress(), *inputs):
+            if not columns:
+                return "Choose at least one column to export"
+            rows = filter_rows(*search_filters(*inputs))
+            chunks = export_chunks(rows, [column for column in exportable_columns() if column in columns])
+            num_chunks = max(1, -(-len(rows) // EXPORT_CHUNK_ROWS))
+            name = exports.write(progress.tqdm(chunks, total=num_chunks, desc="Exporting"), file_format)
+            return f"[Download {len(rows):,} results as {file_format}](/exports/{name})"
+        
+        export_button.click(
+            export_results,
+            inputs=[export_format, export_columns] + search_inputs,
+            outputs=[export_text],
+            # Exports read every result; one at a time keeps memory bounded
+            concurrency_limit=1
         )
         
+        # Handle previous/next page clicks
+        def change_page(results, step):
+            rows = result_cursors.get(results["cursor"]) if results else None
+            if rows is None:
+                return gr.update(), results, "These results have expired, please search again"
+            num_pages = max(1, -(-len(rows) // PAGE_SIZE))
+            page = min(max(results["page"] + step, 0), num_pages - 1)
+            display_data, page_label = results_page(rows, page)
+            return display_data, {"cursor": results["cursor"], "page": page}, page_label
+        
+        previous_button.click(lambda results: change_page(results, -1), inputs=[state],
+                              outputs=[results_table, state, page_text])
+        next_button.click(lambda results: change_page(results, 1), inputs=[state],
+                          outputs=[results_table, state, page_text])
+        
         # Handle row click to show PDF
         def show_pdf(evt: gr.SelectData, results):
-            if not results or evt.index[0] >= len(results):
+            rows = result_cursors.get(results["cursor"]) if results else None
+            position = results["page"] * PAGE_SIZE + evt.index[0] if results else 0
+            if rows is None or position >= len(rows):
                 return "<div>No judgment available for this case</div>"
             
-            selected_case = results[evt.index[0]]
+            # Look the clicked case up by its row id
+            row_id = rows[position]
+            selected_case = cases.take([row_id]).iloc[0]
             pdf_link = selected_case.get("PDF Link", "")
             
             if not pdf_link:
                 return "<div>No judgment available for this case</div>"
             
-            # In a real application, you might embed a PDF viewer here
-            # For this demo, we'll create a simulated PDF viewer with HTML
+            # The judgement text is only read once a case is opened
+            judgement_text = documents.text(row_id)
+            
+            # Embed the PDF when it is in the document store; the browser's
+            # viewer fetches it in byte ranges as pages are shown
+            pdf_name = documents.pdf_name(pdf_link)
+            if pdf_name:
+                pdf_html = f"""
+                <iframe src="/judgements/{pdf_name}" style="width: 100%; height: 600px; border: none;"></iframe>
+                <p>
+                    <a href="/judgements/{pdf_name}" target="_blank" style="background-color: #4CAF50; color: white; padding: 10px 15px; text-decoration: none; border-radius: 4px;">
+                        Open Full Judgment PDF
+                    </a>
+                </p>"""
+            else:
+                pdf_html = "<p>The PDF of this judgment is not available.</p>"
+            
             html = f"""
             <div style="border: 1px solid #ccc; padding: 20px; border-radius: 5px;">
                 <h2>{selected_case['Case Title']}</h2>
                 <p><strong>Court:</strong> {selected_case['Court']}</p>
                 <p><strong>Judge:</strong> {selected_case['Judge']}</p>
                 <p><strong>Case No:</strong> {selected_case['Case No']}/{selected_case['Year']}</p>
-                <p><strong>Decision Date:</strong> {selected_case['Decision Date']}</p>
+                <p><strong>Citation:</strong> {format_text(selected_case.get('Citation'))}</p>
+                <p><strong>Advocates:</strong> {selected_case.get('Lawyers', '')}</p>
+                <p><strong>Decision Date:</strong> {format_date(selected_case['Decision Date'])}</p>
                 <hr/>
                 <div style="background-color: #f9f9f9; padding: 15px; font-family: serif;">
-                    <p>{selected_case['Judgement Text']}</p>
+                    <p>{judgement_text}</p>
                     <p>This judgment relates to {selected_case['Act']} {selected_case['Section']}.</p>
                     <p>After considering all aspects of the case, the court decided to {selected_case['Disposal Nature'].lower()} the petition.</p>
                 </div>
                 <hr/>
-                <p>
-                    <a href="{pdf_link}" target="_blank" style="background-color: #4CAF50; color: white; padding: 10px 15px; text-decoration: none; border-radius: 4px;">
-                        Download Full Judgment PDF
-                    </a>
-                </p>
+                {related_cases_html(row_id)}
+                {pdf_html}
             </div>
             """
             return html
@@ -444,22 +1106,63 @@ def create_interface():
         
         # Handle reset button click
         def reset_filters():
-            return ("ALL", "", "", "ALL", "", "", "", "Phrase(s)", "Exact Match", 
-                   "Bombay High Court", "Select Bench", "Select Case Subject", "", "", 
-                   "", "Select Disposal Nature", "", None, [], "<div>Select a case to view the judgement</div>")
+            # Dropdowns also get their choices back without result counts
+            court, bench, case_type, disposal_nature = (
+                gr.update(choices=dropdown_choices(column), value=placeholder)
+                for column, placeholder in DROPDOWN_PLACEHOLDERS.items()
+            )
+            return (court, "", "", "ALL", "", "", "", "Phrase(s)", "Exact Match", 
+                   "Bombay High Court", bench, case_type, "", "", 
+                   "", disposal_nature, "ALL", "", "", "", False, "", "", "", None, None, "",
+                   "<div>Select a case to view the judgement</div>", "")
         
         reset_button.click(
             reset_filters,
             inputs=[],
             outputs=[court_dropdown, judge_textbox, act_section, time_filter, start_date, end_date, 
-                    search_text,  search_method,   
+                    search_text, search_type, search_method, selected_court, bench_dropdown,
                     case_type_dropdown, case_no, year, party, disposal_dropdown,
-                    results_text, results_table, state, pdf_viewer]
+                    date_of_registeration_time_filter, start_date_of_registeration, end_date_of_registeration, lawyers,
+                    prefer_recent, legal_terms, citations, results_text, results_table, state, page_text, pdf_viewer,
+                    facets_text]
         )
     
     return app
 
 # Launch the app
 if __name__ == "__main__":
-    app = create_interface()
-    app.launch(server_name="0.0.0.0", server_port=10000)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Serve the case search")
+    parser.add_argument("--build-snapshot", action="store_true",
+                        help="load the cases from the source, write the snapshot to INDEX_DIR and exit")
+    parser.add_argument("--verify-snapshot", action="store_true",
+                        help="check every file of the snapshot in INDEX_DIR against its checksum and exit")
+    args = parser.parse_args()
+    startup_step("modules_imported")
+    if args.verify_snapshot:
+        try:
+            manifest = read_manifest(INDEX_DIR)
+        except SnapshotError as e:
+            sys.exit(f"Snapshot in {INDEX_DIR} is unusable: {e}")
+        print(f"Snapshot of {manifest['rows']} cases in {INDEX_DIR} is intact")
+        sys.exit()
+    if args.build_snapshot:
+        load_data(use_snapshot=False)
+        manifest = save_snapshot(INDEX_DIR)
+        print(f"Wrote a snapshot of {manifest['rows']} cases to {INDEX_DIR}")
+        sys.exit()
+    load_data()
+    startup_step("data_loaded")
+    if SEARCH_WORKERS and hasattr(os, "fork"):
+        # Workers share the snapshot's memory maps; write one if there was none
+        if snapshot is None:
+            share_indexes()
+        start_search_pool(SEARCH_WORKERS)
+    import gradio as gr
+    import uvicorn
+    from fastapi import FastAPI
+    # Gradio is mounted on a FastAPI app that also serves the judgement PDFs,
+    # exported results and the search metrics
+    server = add_metrics_route(add_export_routes(add_document_routes(FastAPI(), documents), exports), metrics)
+    app = gr.mount_gradio_app(server, create_interface(), path="")
+    startup_step("interface_built")
+    uvicorn.run(app, host="0.0.0.0", port=10000)
@@ -0,0 +1,210 @@
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+
+# Default histogram buckets: seconds for timings, counts for row numbers
+SECONDS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+ROW_BUCKETS = (0, 10, 100, 1000, 10000, 100000, 1000000, 10000000)
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+# Prometheus-style cumulative histogram, one series per tuple of label values
+class Histogram:
+    def __init__(self, name, help, label_names=(), buckets=SECONDS_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        # label values -> [bucket counts..., +Inf count, sum]
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        bucket = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bucket] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            series = {labels: list(values) for labels, values in self.series.items()}
+        names = self.label_names + ("le",)
+        for label_values, values in sorted(series.items()):
+            total = 0
+            for bound, count in zip(self.buckets + ("+Inf",), values):
+                total += count
+                lines.append(f"{self.name}_bucket{_labels(names, label_values + (bound,))} {total}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, label_values)} {values[-1]}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, label_values)} {total}")
+        return lines
+
+
+# Last value set, one series per tuple of label values
+class Gauge:
+    def __init__(self, name, help, label_names=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def set(self, value, *label_values):
+        with self.lock:
+            self.series[label_values] = value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        with self.lock:
+            series = dict(self.series)
+        for label_values, value in sorted(series.items()):
+            lines.append(f"{self.name}{_labels(self.label_names, label_values)} {value}")
+        return lines
+
+
+# Metrics of this process, rendered in the Prometheus text format
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = []
+
+    def histogram(self, *args, **kwargs):
+        self.metrics.append(Histogram(*args, **kwargs))
+        return self.metrics[-1]
+
+    def gauge(self, *args, **kwargs):
+        self.metrics.append(Gauge(*args, **kwargs))
+        return self.metrics[-1]
+
+    def render(self):
+        return "\n".join(line for metric in self.metrics for line in metric.render()) + "\n"
+
+
+# Stage timings of one search: each mark() closes the stage that started at
+# the previous mark. Stages are plain tuples so they can be returned from a
+# worker process and recorded in the parent's histograms. check, when
+# given, is called after every stage and may raise to stop the work.
+class StageTimer:
+    def __init__(self, check=None):
+        self.stages = []
+        self.last = time.perf_counter()
+        self.check = check
+
+    # rows_in/rows_out are the number of candidate rows before and after
+    def mark(self, stage, rows_in, rows_out):
+        now = time.perf_counter()
+        self.stages.append((stage, now - self.last, rows_in, rows_out))
+        self.last = now
+        if self.check:
+            self.check()
+
+
+# Sampling profiler for slow searches. While enabled, a background thread
+# samples the stack of every thread inside track() each interval seconds;
+# when a tracked block runs longer than threshold seconds its samples are
+# written to output_dir as collapsed stacks ("frame;frame;frame count"),
+# which flame graph tools read. Faster blocks discard their samples.
+class SlowQueryProfiler:
+    def __init__(self, threshold=None, output_dir="slow_queries", interval=0.005):
+        self.threshold = threshold
+        self.output_dir = output_dir
+        self.interval = interval
+        # thread id -> samples of the block running in that thread
+        self.active = {}
+        self.lock = threading.Lock()
+        # Set while any block is tracked, so the sampler sleeps when idle
+        self.busy = threading.Event()
+        self.pid = None
+
+    @property
+    def enabled(self):
+        return self.threshold is not None
+
+    def _start(self):
+        # Threads do not survive a fork, so each process starts its own
+        with self.lock:
+            if self.pid != os.getpid():
+                self.pid = os.getpid()
+                threading.Thread(target=self._sample, daemon=True).start()
+
+    def _sample(self):
+        me = threading.get_ident()
+        while True:
+            self.busy.wait()
+            time.sleep(self.interval)
+            with self.lock:
+                frames = sys._current_frames()
+                for thread_id, samples in self.active.items():
+                    frame = frames.get(thread_id)
+                    stack = []
+                    while frame is not None and thread_id != me:
+                        code = frame.f_code
+                        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                        frame = frame.f_back
+                    if stack:
+                        samples[";".join(reversed(stack))] += 1
+
+    # Context manager around one search; description is written with the
+    # samples when it turns out to be slow
+    def track(self, description):
+        return _Tracked(self, description)
+
+    def _write(self, description, elapsed, samples):
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{int(elapsed * 1000)}ms.txt")
+        with open(path, "w") as f:
+            f.write(f"# {elapsed:.3f}s {description}\n")
+            for stack, count in samples.most_common():
+                f.write(f"{stack} {count}\n")
+        print(f"Slow search ({elapsed:.2f}s), profile written to {path}")
+
+
+class _Tracked:
+    def __init__(self, profiler, description):
+        self.profiler = profiler
+        self.description = description
+
+    def __enter__(self):
+        profiler = self.profiler
+        if profiler.enabled:
+            profiler._start()
+            self.samples = Counter()
+            with profiler.lock:
+                profiler.active[threading.get_ident()] = self.samples
+                profiler.busy.set()
+            self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        profiler = self.profiler
+        if profiler.enabled:
+            elapsed = time.perf_counter() - self.started
+            with profiler.lock:
+                profiler.active.pop(threading.get_ident(), None)
+                if not profiler.active:
+                    profiler.busy.clear()
+            if elapsed >= profiler.threshold and self.samples:
+                profiler._write(self.description, elapsed, self.samples)
+        return False
+
+
+# Add GET /metrics (Prometheus text format) to a FastAPI app
+def add_metrics_route(app, registry):
+    from fastapi.responses import PlainTextResponse
+
+    @app.get("/metrics")
+    def metrics():
+        return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+    return app
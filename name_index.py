@@ -0,0 +1,144 @@
+import re
+
+import numpy as np
+
+# Names are compared lowercased with punctuation collapsed to single spaces,
+# so "D.Y. Chandrachud" and "d y chandrachud" are the same
+_NON_WORD_RE = re.compile(r"[\W_]+")
+
+_EMPTY_ROWS = np.empty(0, dtype=np.int64)
+
+
+def normalize_name(name):
+    return _NON_WORD_RE.sub(" ", str(name).lower()).strip()
+
+
+# Edits allowed between a query and the closest part of a name: none for
+# short queries, then one per five characters
+def max_edits(query):
+    return len(query) // 5
+
+
+# Smallest edit distance between query and any substring of text that
+# starts a word (Sellers' algorithm, anchored at the spaces of a normalized
+# name), or None when it is more than limit. Starting inside a word costs
+# one edit per skipped character, so "union of india" is not close to the
+# "ion of india" in "commission of india".
+def substring_distance(query, text, limit):
+    previous = list(range(len(query) + 1))
+    best = previous[-1]
+    for char in text:
+        current = [0 if char == " " else previous[0] + 1]
+        for i, query_char in enumerate(query):
+            current.append(min(previous[i] + (query_char != char), previous[i + 1] + 1, current[i] + 1))
+        best = min(best, current[-1])
+        previous = current
+    return best if best <= limit else None
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+# Index over the distinct names of a column (judges, parties, lawyers): a
+# trigram index narrows a query to a few candidate names, which are scored
+# by edit distance, and each name maps to the sorted row ids it appears in
+# (rows of name i are rows[offsets[i]:offsets[i + 1]]).
+class NameIndex:
+    def __init__(self, names, rows, offsets):
+        self.names = list(names)
+        self.rows = rows
+        self.offsets = offsets
+        self._grams = None
+
+    # Index (name id, row id) pairs; a row may have several names
+    @classmethod
+    def build(cls, names, name_ids, row_ids):
+        name_ids = np.asarray(name_ids, dtype=np.int64)
+        order = np.lexsort((row_ids, name_ids))
+        offsets = np.searchsorted(name_ids[order], np.arange(len(names) + 1))
+        return cls(names, np.asarray(row_ids, dtype=np.int64)[order], offsets)
+
+    # Index a column of single names, given as categorical codes (-1 missing)
+    @classmethod
+    def from_codes(cls, names, codes):
+        rows = np.flatnonzero(codes >= 0)
+        return cls.build(names, codes[rows], rows)
+
+    # Index a column of separator-joined name lists; missing values (None,
+    # NaN) have no names
+    @classmethod
+    def from_lists(cls, values, separator):
+        ids = {}
+        name_ids = []
+        row_ids = []
+        for row, value in enumerate(values):
+            if not isinstance(value, str):
+                continue
+            for name in value.split(separator):
+                name = name.strip()
+                if name:
+                    name_ids.append(ids.setdefault(name, len(ids)))
+                    row_ids.append(row)
+        return cls.build(list(ids), name_ids, np.array(row_ids, dtype=np.int64))
+
+    def _trigrams(self):
+        if self._grams is None:
+            normalized = [normalize_name(name) for name in self.names]
+            postings = {}
+            for name_id, name in enumerate(normalized):
+                for gram in trigrams(name):
+                    postings.setdefault(gram, []).append(name_id)
+            self._grams = (normalized, {gram: np.array(ids, dtype=np.int64) for gram, ids in postings.items()})
+        return self._grams
+
+    # Names matching query, best first, as (name ids, similarity scores).
+    # A name matches when it contains the query, or when part of it starting
+    # at a word is within max_edits of the query; similarity is
+    # 1 - edits / query length, so substrings score 1.
+    def match(self, query):
+        query = normalize_name(query)
+        if not query:
+            return _EMPTY_ROWS, np.empty(0)
+        normalized, postings = self._trigrams()
+        limit = max_edits(query)
+        # Each edit changes at most 3 of the query's trigrams, so a match
+        # shares at least this many of them with the name. Short queries
+        # whose bound drops to zero still need one shared trigram, rather
+        # than scoring every name.
+        grams = trigrams(query)
+        if grams:
+            needed = max(len(grams) - 3 * limit, 1)
+            hits = [postings[gram] for gram in grams if gram in postings]
+            counts = np.bincount(np.concatenate(hits), minlength=len(normalized)) if hits else np.zeros(len(normalized))
+            candidates = np.flatnonzero(counts >= needed)
+        else:
+            # One or two characters: plain substring match
+            candidates = range(len(normalized))
+
+        name_ids = []
+        scores = []
+        for name_id in candidates:
+            name = normalized[name_id]
+            distance = 0 if query in name else substring_distance(query, name, limit) if limit else None
+            if distance is not None:
+                name_ids.append(name_id)
+                scores.append(1 - distance / len(query))
+        name_ids = np.array(name_ids, dtype=np.int64)
+        scores = np.array(scores)
+        order = np.lexsort((name_ids, -scores))
+        return name_ids[order], scores[order]
+
+    # Sorted row ids with any of the names, and each row's best name score
+    def scored_rows(self, name_ids, scores):
+        if not len(name_ids):
+            return _EMPTY_ROWS, np.empty(0)
+        parts = [self.rows[self.offsets[name_id]:self.offsets[name_id + 1]] for name_id in name_ids]
+        return best_scores(np.concatenate(parts), np.repeat(scores, [len(part) for part in parts]))
+
+
+# Sorted unique rows of (rows, scores) pairs, each with its highest score
+def best_scores(rows, scores):
+    order = np.lexsort((-scores, rows))
+    rows, first = np.unique(rows[order], return_index=True)
+    return rows, scores[order][first]
@@ -0,0 +1,87 @@
+import threading
+from collections import OrderedDict
+
+# Default limits: number of cached result sets and total bytes of row ids
+MAX_ENTRIES = 256
+MAX_BYTES = 256 * 1024 * 1024
+
+
+# LRU cache of search results (row id arrays) keyed by a normalized filter
+# tuple of (name, value) pairs. Results of a query whose filters are a subset
+# of another query's filters are a superset of its results, so a narrower
+# query can be refined from a cached result instead of scanning every row.
+# The cache empties itself when the dataset version changes.
+class QueryCache:
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # key -> (rows, refinable)
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.refinements = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _check_version(self, version):
+        if version != self.version:
+            self.entries.clear()
+            self.nbytes = 0
+            self.version = version
+
+    def get(self, key, version):
+        with self.lock:
+            self._check_version(version)
+            found = self.entries.get(key)
+            if found is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return found[0]
+
+    # Whether key has a cached result, without counting a hit or a miss
+    def contains(self, key, version):
+        with self.lock:
+            return version == self.version and key in self.entries
+
+    # Smallest cached result whose filters are all part of key, or None
+    def find_superset(self, key, version):
+        filters = set(key)
+        best = None
+        with self.lock:
+            self._check_version(version)
+            for cached_key, (rows, refinable) in self.entries.items():
+                if refinable and cached_key and set(cached_key) <= filters and (best is None or len(rows) < len(best)):
+                    best = rows
+            if best is not None:
+                self.refinements += 1
+        return best
+
+    # Cache rows for key; refinable is False for results that are not the
+    # complete set of matches (e.g. top-k rankings)
+    def put(self, key, rows, version, refinable=True):
+        rows.flags.writeable = False
+        with self.lock:
+            self._check_version(version)
+            if key in self.entries:
+                self.nbytes -= self.entries.pop(key)[0].nbytes
+            if rows.nbytes > self.max_bytes:
+                return
+            self.entries[key] = (rows, refinable)
+            self.nbytes += rows.nbytes
+            while len(self.entries) > self.max_entries or self.nbytes > self.max_bytes:
+                self.nbytes -= self.entries.popitem(last=False)[1][0].nbytes
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        return {"entries": len(self.entries), "bytes": self.nbytes, "hits": self.hits,
+                "misses": self.misses, "refinements": self.refinements}
@@ -0,0 +1,149 @@
+import numpy as np
+
+from search_index import TOKEN_RE
+
+# BM25 parameters: term frequency saturation and document length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Blocks scored in the first round of a ranked search; each later round
+# scores twice as many
+FIRST_ROUND_BLOCKS = 16
+
+# Filtered row sets up to this size are scored row by row instead of block
+# by block
+SMALL_ROW_SET = 50000
+
+_EMPTY_ROWS = np.empty(0, dtype=np.int64)
+
+
+# BM25 term frequency component for frequencies tfs in documents of the
+# given lengths. It grows with tf and shrinks with length, so the block's
+# highest tf and shortest length give an upper bound for the whole block.
+def _tf_weight(tfs, lengths, average_length):
+    tfs = np.asarray(tfs, dtype=np.float64)
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * np.asarray(lengths) / max(average_length, 1e-9))
+    return tfs * (BM25_K1 + 1) / (tfs + norm)
+
+
+def _idf(num_rows, df):
+    return np.log(1 + (num_rows - df + 0.5) / (df + 0.5))
+
+
+# One query term in one field
+class _Term:
+    def __init__(self, index, postings, weight):
+        self.index = index
+        self.postings = postings
+        self.weight = weight
+        self.average_length = index.average_length()
+
+    def block_bounds(self):
+        postings = self.postings
+        return self.weight * _tf_weight(postings.block_max_tf, postings.block_min_length, self.average_length)
+
+    # Rows of the term inside the given sorted block ids, with their scores
+    def score_blocks(self, blocks):
+        postings = self.postings
+        found = np.searchsorted(postings.blocks, blocks)
+        found = found[found < len(postings.blocks)]
+        found = found[np.isin(postings.blocks[found], blocks, assume_unique=True)]
+        if not len(found):
+            return _EMPTY_ROWS, np.empty(0)
+        starts = postings.block_starts[found]
+        counts = postings.block_starts[found + 1] - starts
+        # Concatenated ranges starts[i]:starts[i] + counts[i]
+        positions = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        return self._score(postings.rows[positions], postings.tfs[positions])
+
+    # Scores of the given rows that contain the term
+    def score_rows(self, rows):
+        postings = self.postings
+        found = np.searchsorted(postings.rows, rows)
+        found = np.minimum(found, len(postings.rows) - 1)
+        hit = postings.rows[found] == rows
+        return self._score(rows[hit], postings.tfs[found[hit]])
+
+    def _score(self, rows, tfs):
+        rows = np.asarray(rows, dtype=np.int64)
+        return rows, self.weight * _tf_weight(tfs, self.index.row_lengths(rows), self.average_length)
+
+
+# Sum the (rows, scores) pairs per row; returns sorted unique rows
+def _sum_scores(parts):
+    if not parts:
+        return _EMPTY_ROWS, np.empty(0)
+    rows, inverse = np.unique(np.concatenate([rows for rows, _ in parts]), return_inverse=True)
+    return rows, np.bincount(inverse, weights=np.concatenate([scores for _, scores in parts]), minlength=len(rows))
+
+
+# The k best of (rows, scores), ordered by score then row id
+def _best(rows, scores, k):
+    if len(rows) > k:
+        keep = np.argpartition(-scores, k - 1)[:k]
+        rows, scores = rows[keep], scores[keep]
+    order = np.lexsort((rows, -scores))
+    return rows[order], scores[order]
+
+
+# Top k rows for query by BM25 over several fields, given as (InvertedIndex,
+# boost) pairs: each field scores the query's tokens with its own document
+# frequencies and lengths, and a row's score is the boosted sum. rows
+# restricts the search; row_weights(rows), with values in [0, 1],
+# scales the scores (e.g. for recency). Returns (row ids, scores), best first.
+#
+# Large searches are answered block by block: each block of BLOCK_ROWS row
+# ids has an upper bound on its score from the per-block maxima of its
+# terms, blocks are scored from the highest bound down, and the search stops
+# once no remaining block can beat the k-th best score. The cost therefore
+# follows k and how clearly the best rows stand out, not how many rows
+# contain common terms.
+def bm25_top_k(fields, query, k, rows=None, row_weights=None):
+    tokens = list(dict.fromkeys(TOKEN_RE.findall(str(query).lower())))
+    terms = []
+    for index, boost in fields:
+        for token in tokens:
+            postings = index.doc_postings(token)
+            if postings is not None and len(postings):
+                weight = boost * _idf(index.num_rows, len(postings))
+                terms.append(_Term(index, postings, weight))
+    if not terms or k <= 0 or (rows is not None and not len(rows)):
+        return _EMPTY_ROWS, np.empty(0)
+
+    def finish(candidate_rows, scores):
+        if row_weights is not None and len(candidate_rows):
+            scores = scores * row_weights(candidate_rows)
+        return candidate_rows, scores
+
+    if rows is not None and len(rows) <= SMALL_ROW_SET:
+        return _best(*finish(*_sum_scores([term.score_rows(rows) for term in terms])), k)
+
+    allowed = None
+    if rows is not None:
+        allowed = np.zeros(max(index.num_rows for index, _ in fields), dtype=bool)
+        allowed[rows] = True
+
+    # Upper bound of every block holding any term: the sum of its terms' bounds
+    blocks, inverse = np.unique(np.concatenate([term.postings.blocks for term in terms]), return_inverse=True)
+    bounds = np.bincount(inverse, weights=np.concatenate([term.block_bounds() for term in terms]),
+                         minlength=len(blocks))
+    order = np.argsort(-bounds, kind="stable")
+
+    best_rows, best_scores = _EMPTY_ROWS, np.empty(0)
+    done = 0
+    batch = FIRST_ROUND_BLOCKS
+    while done < len(order):
+        selected = np.sort(blocks[order[done:done + batch]])
+        done += batch
+        batch *= 2
+        candidate_rows, scores = _sum_scores([term.score_blocks(selected) for term in terms])
+        if allowed is not None:
+            keep = allowed[candidate_rows]
+            candidate_rows, scores = candidate_rows[keep], scores[keep]
+        candidate_rows, scores = finish(candidate_rows, scores)
+        best_rows, best_scores = _best(np.concatenate([best_rows, candidate_rows]),
+                                       np.concatenate([best_scores, scores]), k)
+        # Row weights are at most 1, so the bounds hold for weighted scores
+        if len(best_rows) == k and done < len(order) and bounds[order[done]] < best_scores[-1]:
+            break
+    return best_rows, best_scores
@@ -0,0 +1,54 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+# Defaults for how many result sets are kept and for how long
+MAX_CURSORS = 1000
+CURSOR_TTL_SECONDS = 30 * 60
+
+
+# Search results kept server-side as row id arrays, one per search, so the
+# browser session only holds a cursor id. Least recently used cursors are
+# evicted beyond max_cursors, and any cursor unused for ttl seconds expires.
+class ResultCursors:
+    def __init__(self, max_cursors=MAX_CURSORS, ttl=CURSOR_TTL_SECONDS):
+        self.max_cursors = max_cursors
+        self.ttl = ttl
+        self.cursors = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.cursors)
+
+    def _evict(self, now):
+        while self.cursors:
+            cursor_id, (_, last_used) = next(iter(self.cursors.items()))
+            if len(self.cursors) <= self.max_cursors and now - last_used <= self.ttl:
+                break
+            del self.cursors[cursor_id]
+
+    # Store the row ids of a result set and return its cursor id
+    def create(self, rows):
+        cursor_id = uuid.uuid4().hex
+        now = time.monotonic()
+        with self.lock:
+            self.cursors[cursor_id] = (rows, now)
+            self._evict(now)
+        return cursor_id
+
+    # Row ids for a cursor, or None if it has expired or been evicted
+    def get(self, cursor_id):
+        now = time.monotonic()
+        with self.lock:
+            self._evict(now)
+            found = self.cursors.get(cursor_id)
+            if found is None:
+                return None
+            self.cursors[cursor_id] = (found[0], now)
+            self.cursors.move_to_end(cursor_id)
+            return found[0]
+
+    def discard(self, cursor_id):
+        with self.lock:
+            self.cursors.pop(cursor_id, None)
@@ -0,0 +1,343 @@
+import json
+import mmap
+import os
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+# Tokens are maximal runs of word characters in the lowercased text, so any
+# substring made only of word characters always sits inside a single token
+TOKEN_RE = re.compile(r"\w+")
+
+# Regex metacharacters; a pattern containing one of these cannot be resolved
+# from tokens and falls back to scanning the text
+REGEX_CHARS = set(".^$*+?{}[]\\|()")
+
+# Each posting is packed as (row id << POSITION_BITS) | token position, so a
+# posting list is one sorted int64 array and phrase matching is an intersection
+POSITION_BITS = 24
+
+# Rows per block of the per-block score bounds used by ranked search
+BLOCK_ROWS = 1024
+
+_EMPTY_KEYS = np.empty(0, dtype=np.int64)
+
+
+# Distinct values of an array, sorted. Sorts first unless already sorted, then
+# drops repeats in one pass: np.unique hashes its input, which is many times
+# slower on large int64 arrays such as posting keys and row ids.
+def sorted_unique(values, presorted=False):
+    values = np.asarray(values) if presorted else np.sort(values)
+    if len(values) < 2:
+        return values
+    keep = np.empty(len(values), dtype=bool)
+    keep[0] = True
+    np.not_equal(values[1:], values[:-1], out=keep[1:])
+    return values[keep]
+
+
+# Document-level postings of one token, for ranking: the sorted rows that
+# contain it and its frequency in each. Rows are grouped into blocks of
+# BLOCK_ROWS row ids; rows of the i-th block are
+# rows[block_starts[i]:block_starts[i + 1]], and each block keeps its highest
+# frequency and shortest document so a score bound needs no row access.
+class DocPostings:
+    def __init__(self, rows, tfs, blocks, block_starts, block_max_tf, block_min_length):
+        self.rows = rows
+        self.tfs = tfs
+        self.blocks = blocks
+        self.block_starts = block_starts
+        self.block_max_tf = block_max_tf
+        self.block_min_length = block_min_length
+
+    def __len__(self):
+        return len(self.rows)
+
+    # From sorted (row << POSITION_BITS | position) keys; lengths(rows) gives
+    # the number of tokens of each row
+    @classmethod
+    def from_keys(cls, keys, lengths):
+        rows, tfs = np.unique(np.asarray(keys) >> POSITION_BITS, return_counts=True)
+        return cls.from_rows(rows, tfs, lengths)
+
+    @classmethod
+    def from_rows(cls, rows, tfs, lengths):
+        blocks, starts = np.unique(rows // BLOCK_ROWS, return_index=True)
+        if not len(rows):
+            return cls(rows, tfs, blocks, np.zeros(1, dtype=np.int64), tfs, tfs)
+        return cls(rows, tfs, blocks, np.append(starts, len(rows)),
+                   np.maximum.reduceat(tfs, starts), np.minimum.reduceat(lengths(rows), starts))
+
+
+# Read-only postings of a saved index, memory-mapped. Tokens are sorted and
+# token i's postings are keys[offsets[i]:offsets[i + 1]]. The vocabulary is
+# stored "\n"-joined as UTF-8 so suffix and substring lookups search raw bytes.
+class FrozenPostings:
+    def __init__(self, vocabulary, token_starts, offsets, keys, docs=None):
+        self.vocabulary = vocabulary
+        self.token_starts = token_starts
+        self.offsets = offsets
+        self.keys = keys
+        # Document-level postings of every token, as CSR arrays (see save)
+        self.docs = docs
+        self.tokens = range(len(offsets) - 1)
+
+    def token(self, token_id):
+        return self.vocabulary[self.token_starts[token_id]:self.token_starts[token_id + 1] - 1].decode()
+
+    def token_ids(self, word, mode):
+        if mode == "exact":
+            found = bisect_left(self.tokens, word, key=self.token)
+            return [found] if found < len(self.tokens) and self.token(found) == word else []
+        if mode == "prefix":
+            low = bisect_left(self.tokens, word, key=self.token)
+            high = bisect_right(self.tokens, word, key=lambda token_id: self.token(token_id)[:len(word)])
+            return list(range(low, high))
+        pattern = (word + "\n" if mode == "suffix" else word).encode()
+        found = {}
+        start = self.vocabulary.find(pattern)
+        while start != -1:
+            found[int(np.searchsorted(self.token_starts, start, side="right")) - 1] = True
+            start = self.vocabulary.find(pattern, start + 1)
+        return list(found)
+
+    def token_keys(self, token_id):
+        return self.keys[self.offsets[token_id]:self.offsets[token_id + 1]]
+
+    def doc_postings(self, token_id):
+        docs = self.docs
+        start, end = docs["doc_offsets"][token_id], docs["doc_offsets"][token_id + 1]
+        block_start, block_end = docs["block_offsets"][token_id], docs["block_offsets"][token_id + 1]
+        return DocPostings(docs["doc_rows"][start:end], docs["doc_tfs"][start:end],
+                           docs["block_ids"][block_start:block_end],
+                           np.append(docs["block_starts"][block_start:block_end] - start, end - start),
+                           docs["block_max_tf"][block_start:block_end], docs["block_min_length"][block_start:block_end])
+
+
+# Positional inverted index over one text column: token -> sorted postings.
+# A loaded index keeps its postings memory-mapped (frozen); rows added after
+# loading are indexed in memory alongside. The number of tokens of each row
+# is kept for ranking.
+class InvertedIndex:
+    def __init__(self, frozen=None, num_rows=0, frozen_lengths=None, total_length=0):
+        self.frozen = frozen
+        self.postings = {}
+        self.num_rows = num_rows
+        # Token counts of the frozen rows, then of rows added in memory
+        self.frozen_lengths = frozen_lengths if frozen_lengths is not None else np.empty(0, dtype=np.int32)
+        self.lengths = array("i")
+        self.total_length = total_length
+        # Lazily built "\n"-joined vocabulary used for prefix/suffix/substring
+        # lookups of the in-memory tokens; reset whenever a new token is added
+        self._vocab = None
+        # token -> (number of keys when built, DocPostings) of in-memory tokens
+        self._docs = {}
+
+    # Row ids must be added in increasing order to keep the postings sorted
+    def add(self, row_id, text):
+        postings = self.postings
+        base = row_id << POSITION_BITS
+        position = -1
+        for position, match in enumerate(TOKEN_RE.finditer(str(text).lower())):
+            token = match.group()
+            keys = postings.get(token)
+            if keys is None:
+                keys = postings[token] = array("q")
+                self._vocab = None
+            keys.append(base | position)
+        self.num_rows = max(self.num_rows, row_id + 1)
+        # Rows skipped over have no tokens
+        lengths = self.lengths
+        lengths.extend([0] * (row_id - len(self.frozen_lengths) - len(lengths)))
+        lengths.append(position + 1)
+        self.total_length += position + 1
+
+    def add_many(self, row_ids, texts):
+        for row_id, text in zip(row_ids, texts):
+            self.add(int(row_id), text)
+
+    def _vocabulary(self):
+        if self._vocab is None:
+            tokens = list(self.postings)
+            offsets = []
+            position = 1
+            for token in tokens:
+                offsets.append(position)
+                position += len(token) + 1
+            self._vocab = ("\n" + "\n".join(tokens) + "\n", offsets, tokens)
+        return self._vocab
+
+    # In-memory tokens that equal, start with, end with or contain the word
+    def matching_tokens(self, word, mode="contains"):
+        if mode == "exact":
+            return [word] if word in self.postings else []
+        joined, offsets, tokens = self._vocabulary()
+        pattern = {"prefix": "\n" + word, "suffix": word + "\n"}.get(mode, word)
+        found = {}
+        start = joined.find(pattern)
+        while start != -1:
+            token_id = bisect_right(offsets, start + (mode == "prefix")) - 1
+            found[token_id] = True
+            start = joined.find(pattern, start + 1)
+        return [tokens[token_id] for token_id in found]
+
+    # Sorted postings of every token matching the word
+    def _keys(self, word, mode="contains"):
+        parts = [np.frombuffer(self.postings[token], dtype=np.int64) for token in self.matching_tokens(word, mode)]
+        if self.frozen is not None:
+            parts += [self.frozen.token_keys(token_id) for token_id in self.frozen.token_ids(word, mode)]
+        if not parts:
+            return _EMPTY_KEYS
+        if len(parts) == 1:
+            return parts[0]
+        # A position holds one token, so the parts never share a key
+        return np.sort(np.concatenate(parts))
+
+    # Number of tokens of each of the rows
+    def row_lengths(self, rows):
+        rows = np.asarray(rows, dtype=np.int64)
+        num_frozen = len(self.frozen_lengths)
+        added = np.frombuffer(self.lengths, dtype=np.int32) if self.lengths else np.empty(0, dtype=np.int32)
+        lengths = np.zeros(len(rows), dtype=np.int64)
+        frozen = rows < num_frozen
+        lengths[frozen] = self.frozen_lengths[rows[frozen]]
+        indexed = ~frozen & (rows < num_frozen + len(added))
+        lengths[indexed] = added[rows[indexed] - num_frozen]
+        return lengths
+
+    # Mean number of tokens per row
+    def average_length(self):
+        return self.total_length / self.num_rows if self.num_rows else 0.0
+
+    # DocPostings of a token (an exact, lowercased token), or None when no
+    # row contains it
+    def doc_postings(self, token):
+        parts = []
+        if self.frozen is not None:
+            token_ids = self.frozen.token_ids(token, "exact")
+            if token_ids:
+                parts.append(self.frozen.doc_postings(token_ids[0]))
+        keys = self.postings.get(token)
+        if keys is not None:
+            cached = self._docs.get(token)
+            if cached is None or cached[0] != len(keys):
+                cached = self._docs[token] = (len(keys), DocPostings.from_keys(np.frombuffer(keys, dtype=np.int64),
+                                                                                self.row_lengths))
+            parts.append(cached[1])
+        if not parts:
+            return None
+        if len(parts) == 1:
+            return parts[0]
+        # Rows added in memory all follow the frozen rows
+        return DocPostings.from_rows(np.concatenate([part.rows for part in parts]),
+                                     np.concatenate([part.tfs for part in parts]), self.row_lengths)
+
+    # Sorted unique row ids whose text contains the word (word characters only)
+    def rows_for_word(self, word):
+        return sorted_unique(self._keys(word) >> POSITION_BITS, presorted=True)
+
+    # Candidate rows for a case-insensitive substring query. Returns
+    # (rows, exact): rows is a sorted superset of the matching row ids (or
+    # None when the query has no word characters to look up) and exact tells
+    # whether the candidates need no further verification against the text.
+    def candidates(self, query, literal=True):
+        query = query.lower()
+        if not literal and REGEX_CHARS & set(query):
+            return None, False
+        words = TOKEN_RE.findall(query)
+        if not words:
+            return None, False
+        if len(words) == 1:
+            return self.rows_for_word(words[0]), words[0] == query
+
+        # Consecutive tokens: the first must end with its word, the last must
+        # start with its word and every word in between must match exactly
+        keys = None
+        last = len(words) - 1
+        for offset, word in enumerate(words):
+            mode = "suffix" if offset == 0 else "prefix" if offset == last else "exact"
+            shifted = self._keys(word, mode) - offset
+            keys = shifted if keys is None else np.intersect1d(keys, shifted, assume_unique=True)
+            if not len(keys):
+                break
+        return sorted_unique(keys >> POSITION_BITS, presorted=True), False
+
+    # Write the index (frozen and in-memory postings) to directory
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        tokens = set(self.postings)
+        if self.frozen is not None:
+            tokens.update(self.frozen.token(token_id) for token_id in self.frozen.tokens)
+        tokens = sorted(tokens)
+
+        token_keys = []
+        docs = []
+        for token in tokens:
+            parts = []
+            if self.frozen is not None:
+                parts += [self.frozen.token_keys(token_id) for token_id in self.frozen.token_ids(token, "exact")]
+            if token in self.postings:
+                parts.append(np.frombuffer(self.postings[token], dtype=np.int64))
+            token_keys.append(parts)
+            docs.append(self.doc_postings(token))
+        offsets = np.zeros(len(tokens) + 1, dtype=np.int64)
+        np.cumsum([sum(len(part) for part in parts) for parts in token_keys], out=offsets[1:])
+        keys = np.lib.format.open_memmap(os.path.join(directory, "keys.npy"), mode="w+", dtype=np.int64,
+                                         shape=(int(offsets[-1]),))
+        for token_id, parts in enumerate(token_keys):
+            if parts:
+                keys[offsets[token_id]:offsets[token_id + 1]] = np.concatenate(parts)
+        keys.flush()
+        del keys
+
+        encoded = [token.encode() for token in tokens]
+        token_starts = np.zeros(len(tokens) + 1, dtype=np.int64)
+        np.cumsum([len(token) + 1 for token in encoded], out=token_starts[1:])
+        token_starts += 1
+        with open(os.path.join(directory, "vocabulary.bin"), "wb") as f:
+            f.write(b"\n" + b"\n".join(encoded) + b"\n")
+        np.save(os.path.join(directory, "token_starts.npy"), token_starts)
+        np.save(os.path.join(directory, "offsets.npy"), offsets)
+
+        # Document-level postings, token i's in doc_offsets[i]:doc_offsets[i + 1]
+        # of the doc arrays and block_offsets[i]:block_offsets[i + 1] of the
+        # block arrays (block_starts index the doc arrays)
+        doc_offsets = np.zeros(len(tokens) + 1, dtype=np.int64)
+        np.cumsum([len(doc) for doc in docs], out=doc_offsets[1:])
+        block_offsets = np.zeros(len(tokens) + 1, dtype=np.int64)
+        np.cumsum([len(doc.blocks) for doc in docs], out=block_offsets[1:])
+        arrays = {
+            "doc_offsets": doc_offsets,
+            "doc_rows": np.concatenate([doc.rows for doc in docs] or [_EMPTY_KEYS]),
+            "doc_tfs": np.concatenate([doc.tfs for doc in docs] or [_EMPTY_KEYS]).astype(np.int32),
+            "block_offsets": block_offsets,
+            "block_ids": np.concatenate([doc.blocks for doc in docs] or [_EMPTY_KEYS]),
+            "block_starts": np.concatenate([doc.block_starts[:-1] + start
+                                            for doc, start in zip(docs, doc_offsets)] or [_EMPTY_KEYS]),
+            "block_max_tf": np.concatenate([doc.block_max_tf for doc in docs] or [_EMPTY_KEYS]).astype(np.int32),
+            "block_min_length": np.concatenate([doc.block_min_length for doc in docs] or [_EMPTY_KEYS]).astype(np.int32),
+            "lengths": self.row_lengths(np.arange(self.num_rows)).astype(np.int32),
+        }
+        for name, values in arrays.items():
+            np.save(os.path.join(directory, f"{name}.npy"), values)
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump({"num_rows": self.num_rows, "total_length": self.total_length}, f)
+
+    # Load a saved index with its postings memory-mapped read-only
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        with open(os.path.join(directory, "vocabulary.bin"), "rb") as f:
+            vocabulary = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        docs = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+                for name in ("doc_offsets", "doc_rows", "doc_tfs", "block_offsets", "block_ids", "block_starts",
+                             "block_max_tf", "block_min_length")}
+        frozen = FrozenPostings(vocabulary,
+                                np.load(os.path.join(directory, "token_starts.npy"), mmap_mode="r"),
+                                np.load(os.path.join(directory, "offsets.npy"), mmap_mode="r"),
+                                np.load(os.path.join(directory, "keys.npy"), mmap_mode="r"), docs)
+        return cls(frozen, meta["num_rows"], np.load(os.path.join(directory, "lengths.npy"), mmap_mode="r"),
+                   meta["total_length"])
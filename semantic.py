@@ -0,0 +1,289 @@
+import hashlib
+import json
+import os
+from collections import Counter
+
+import numpy as np
+
+from search_index import TOKEN_RE
+
+# Rows encoded per batch when building embeddings
+BATCH_SIZE = 1024
+
+# Above this many rows an inverted-file (IVF) index is built so queries only
+# score the vectors in the few clusters nearest to the query
+IVF_MIN_ROWS = 50000
+IVF_PROBES = 16
+
+# Documents sampled to fit the LSA encoder
+LSA_SAMPLE_SIZE = 5000
+
+# Pre-filtered queries with at most this many rows are scored exactly
+EXACT_SEARCH_ROWS = 100000
+
+
+def _tokens(text):
+    return [token for token in TOKEN_RE.findall(str(text).lower()) if len(token) > 1]
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+# TF-IDF + truncated SVD (latent semantic analysis) encoder. Needs only numpy
+# and is fitted on a sample of the corpus, so nothing is downloaded.
+class LsaEncoder:
+    kind = "lsa"
+
+    def __init__(self, vocabulary, idf, components):
+        self.vocabulary = list(vocabulary)
+        self.token_ids = {token: i for i, token in enumerate(self.vocabulary)}
+        self.idf = np.asarray(idf, dtype=np.float32)
+        self.components = np.asarray(components, dtype=np.float32)
+
+    @property
+    def dim(self):
+        return self.components.shape[0]
+
+    @classmethod
+    def fit(cls, texts, vocabulary_size=4096, dim=128, seed=0):
+        texts = list(texts)
+        rng = np.random.default_rng(seed)
+        document_frequency = Counter()
+        for text in texts:
+            # Distinct tokens in order of appearance rather than a set, whose
+            # order (and so which tokens win ties below) varies by process
+            document_frequency.update(dict.fromkeys(_tokens(text), 1))
+        vocabulary = [token for token, _ in document_frequency.most_common(vocabulary_size)]
+        idf = np.log((1 + len(texts)) / (1 + np.array([document_frequency[t] for t in vocabulary]))) + 1
+        encoder = cls(vocabulary, idf, np.eye(len(vocabulary), dtype=np.float32))
+        sample = encoder._tfidf(texts)
+
+        # Randomized SVD of the sample's TF-IDF matrix
+        dim = min(dim, *sample.shape)
+        projection = sample @ rng.standard_normal((sample.shape[1], dim + 10)).astype(np.float32)
+        for _ in range(2):
+            projection = sample @ (sample.T @ projection)
+        basis, _ = np.linalg.qr(projection)
+        _, _, components = np.linalg.svd(basis.T @ sample, full_matrices=False)
+        encoder.components = components[:dim].astype(np.float32)
+        return encoder
+
+    def _tfidf(self, texts):
+        matrix = np.zeros((len(texts), len(self.vocabulary)), dtype=np.float32)
+        for row, text in enumerate(texts):
+            ids = [self.token_ids[t] for t in _tokens(text) if t in self.token_ids]
+            if ids:
+                ids, counts = np.unique(ids, return_counts=True)
+                matrix[row, ids] = 1 + np.log(counts)
+        return _normalize(matrix * self.idf)
+
+    # Unit-length float32 vectors, one row per text
+    def encode(self, texts):
+        return _normalize(self._tfidf(list(texts)) @ self.components.T).astype(np.float32)
+
+    def save(self, path):
+        np.savez(path, vocabulary=np.array(self.vocabulary), idf=self.idf, components=self.components)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as saved:
+            return cls(saved["vocabulary"].tolist(), saved["idf"], saved["components"])
+
+
+# Sentence embedding model run on CPU, used when sentence-transformers is
+# installed and a model name is configured
+class SentenceTransformerEncoder:
+    kind = "sentence-transformers"
+
+    def __init__(self, model_name):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError("Install sentence-transformers to use an embedding model, "
+                              "or leave the model unset to use the built-in LSA encoder") from e
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name, device="cpu")
+
+    @property
+    def dim(self):
+        return self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts):
+        return self.model.encode(list(texts), batch_size=64, normalize_embeddings=True).astype(np.float32)
+
+
+# Coarse k-means quantizer: each vector is assigned to its nearest centroid and
+# vectors are stored grouped by centroid (order + offsets)
+def build_ivf(embeddings, seed=0, iterations=10, sample_size=100000):
+    rng = np.random.default_rng(seed)
+    num_lists = max(1, int(np.sqrt(len(embeddings))))
+    sample = embeddings[np.sort(rng.choice(len(embeddings), min(sample_size, len(embeddings)), replace=False))]
+    centroids = sample[rng.choice(len(sample), num_lists, replace=False)]
+    for _ in range(iterations):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        filled = np.bincount(assignment, minlength=num_lists) > 0
+        centroids[filled] = _normalize(sums[filled])
+    assignment = np.concatenate([np.argmax(embeddings[start:start + BATCH_SIZE * 64] @ centroids.T, axis=1)
+                                 for start in range(0, len(embeddings), BATCH_SIZE * 64)])
+    order = np.argsort(assignment, kind="stable").astype(np.int64)
+    offsets = np.searchsorted(assignment[order], np.arange(num_lists + 1))
+    return centroids.astype(np.float32), order, offsets
+
+
+# Top-k (ids, scores) by descending score
+def top_k(ids, scores, k):
+    if len(scores) > k:
+        keep = np.argpartition(-scores, k)[:k]
+        ids, scores = ids[keep], scores[keep]
+    order = np.argsort(-scores, kind="stable")
+    return ids[order], scores[order]
+
+
+# Embedding matrix (memory-mapped, read-only) plus optional IVF index. Rows
+# added after the build are kept in memory and always scored exactly.
+class SemanticIndex:
+    def __init__(self, encoder, embeddings, ivf=None):
+        self.encoder = encoder
+        self.embeddings = embeddings
+        self.ivf = ivf
+        self.extra = np.empty((0, embeddings.shape[1]), dtype=np.float32)
+
+    def __len__(self):
+        return len(self.embeddings) + len(self.extra)
+
+    # Encode texts (a sliceable sequence) in batches straight into an on-disk
+    # float32 matrix
+    @classmethod
+    def build(cls, directory, texts, count, fingerprint, model_name=None):
+        os.makedirs(directory, exist_ok=True)
+        if model_name:
+            encoder = SentenceTransformerEncoder(model_name)
+        else:
+            sample = np.random.default_rng(0).choice(count, min(count, LSA_SAMPLE_SIZE), replace=False)
+            encoder = LsaEncoder.fit([texts[i:i + 1][0] for i in np.sort(sample)])
+            encoder.save(os.path.join(directory, "encoder.npz"))
+        embeddings = np.lib.format.open_memmap(os.path.join(directory, "embeddings.npy"), mode="w+",
+                                               dtype=np.float32, shape=(count, encoder.dim))
+        for start in range(0, count, BATCH_SIZE):
+            embeddings[start:start + BATCH_SIZE] = encoder.encode(texts[start:start + BATCH_SIZE])
+        embeddings.flush()
+        ivf_path = os.path.join(directory, "ivf.npz")
+        if count >= IVF_MIN_ROWS:
+            centroids, order, offsets = build_ivf(embeddings)
+            np.savez(ivf_path, centroids=centroids, order=order, offsets=offsets)
+        elif os.path.exists(ivf_path):
+            os.remove(ivf_path)
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump({"fingerprint": fingerprint, "rows": count, "dim": encoder.dim,
+                       "encoder": encoder.kind, "model_name": model_name}, f)
+        del embeddings
+        return cls.load(directory)
+
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        if meta["encoder"] == LsaEncoder.kind:
+            encoder = LsaEncoder.load(os.path.join(directory, "encoder.npz"))
+        else:
+            encoder = SentenceTransformerEncoder(meta["model_name"])
+        embeddings = np.load(os.path.join(directory, "embeddings.npy"), mmap_mode="r")
+        ivf = None
+        if os.path.exists(os.path.join(directory, "ivf.npz")):
+            with np.load(os.path.join(directory, "ivf.npz")) as saved:
+                ivf = (saved["centroids"], saved["order"], saved["offsets"])
+        return cls(encoder, embeddings, ivf)
+
+    # Reuse the index in directory if it was built for the same corpus
+    @classmethod
+    def open_or_build(cls, directory, texts, count, fingerprint, model_name=None):
+        try:
+            with open(os.path.join(directory, "meta.json")) as f:
+                meta = json.load(f)
+            if meta["fingerprint"] == fingerprint and meta.get("model_name") == model_name:
+                return cls.load(directory)
+        except (OSError, ValueError, KeyError):
+            pass
+        return cls.build(directory, texts, count, fingerprint, model_name)
+
+    # Write the index, added rows included, to directory. The IVF lists only
+    # cover the rows they were built from, so they are rebuilt when rows were
+    # added.
+    def save(self, directory, fingerprint=None):
+        os.makedirs(directory, exist_ok=True)
+        if self.encoder.kind == LsaEncoder.kind:
+            self.encoder.save(os.path.join(directory, "encoder.npz"))
+        embeddings = np.lib.format.open_memmap(os.path.join(directory, "embeddings.npy"), mode="w+",
+                                               dtype=np.float32, shape=(len(self), self.embeddings.shape[1]))
+        embeddings[:len(self.embeddings)] = self.embeddings
+        embeddings[len(self.embeddings):] = self.extra
+        embeddings.flush()
+        ivf = self.ivf
+        if len(self.extra):
+            ivf = build_ivf(embeddings) if len(self) >= IVF_MIN_ROWS else None
+        if ivf is not None:
+            centroids, order, offsets = ivf
+            np.savez(os.path.join(directory, "ivf.npz"), centroids=centroids, order=order, offsets=offsets)
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump({"fingerprint": fingerprint, "rows": len(self), "dim": self.encoder.dim,
+                       "encoder": self.encoder.kind, "model_name": getattr(self.encoder, "model_name", None)}, f)
+        del embeddings
+
+    def add(self, texts):
+        self.extra = np.vstack([self.extra, self.encoder.encode(texts)])
+
+    def _scores(self, query, rows):
+        base = len(self.embeddings)
+        in_base = rows[rows < base]
+        scores = np.empty(len(rows), dtype=np.float32)
+        scores[:len(in_base)] = self.embeddings[in_base] @ query
+        scores[len(in_base):] = self.extra[rows[len(in_base):] - base] @ query
+        return scores
+
+    # Row ids ranked by cosine similarity to the query (best first), limited
+    # to the k best with a positive score; rows restricts the search to a
+    # pre-filtered, ascending set of row ids
+    def search(self, query, k=1000, rows=None, probes=IVF_PROBES):
+        query = self.encoder.encode([query])[0]
+        if not query.any():
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        if rows is not None and len(rows) <= EXACT_SEARCH_ROWS:
+            candidates = np.asarray(rows, dtype=np.int64)
+        elif self.ivf is not None:
+            centroids, order, offsets = self.ivf
+            nearest = np.argpartition(-(centroids @ query), min(probes, len(centroids)) - 1)[:probes]
+            candidates = np.sort(np.concatenate([order[offsets[i]:offsets[i + 1]] for i in nearest]
+                                                + [np.arange(len(self.embeddings), len(self))]))
+            if rows is not None:
+                allowed = np.zeros(len(self), dtype=bool)
+                allowed[rows] = True
+                candidates = candidates[allowed[candidates]]
+        else:
+            candidates = np.arange(len(self)) if rows is None else np.asarray(rows, dtype=np.int64)
+        ids, scores = top_k(candidates, self._scores(query, candidates), k)
+        keep = scores > 0
+        return ids[keep], scores[keep]
+
+
+# Fingerprint of a corpus, used to tell whether a stored index is stale: a
+# digest of every embedded document (not just the titles, which many cases
+# share), fed a chunk at a time as the corpus is read
+class CorpusFingerprint:
+    def __init__(self):
+        self.digest = hashlib.sha1()
+        self.count = 0
+
+    def update(self, documents):
+        for document in documents:
+            encoded = str(document).encode()
+            # Length-prefixed, so documents cannot run into each other
+            self.digest.update(len(encoded).to_bytes(8, "little"))
+            self.digest.update(encoded)
+            self.count += 1
+
+    def hexdigest(self):
+        return f"{self.count}-{self.digest.hexdigest()}"
@@ -0,0 +1,88 @@
+import json
+import os
+import shutil
+import zlib
+from datetime import datetime
+
+# Layout version of snapshots. Bump it whenever a saved part changes format,
+# so that older snapshots are rebuilt instead of misread.
+SNAPSHOT_VERSION = 1
+
+MANIFEST_NAME = "manifest.json"
+
+# Bytes read at a time when checksumming a file
+_BLOCK_SIZE = 1 << 20
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def _checksum(path):
+    crc = 0
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_BLOCK_SIZE), b""):
+            crc = zlib.crc32(block, crc)
+    return f"{crc:08x}"
+
+
+# Files under directory, as sorted "/"-separated relative paths
+def _files(directory):
+    found = []
+    for root, _, names in os.walk(directory):
+        found += [os.path.relpath(os.path.join(root, name), directory).replace(os.sep, "/") for name in names]
+    return sorted(found)
+
+
+# Write a snapshot to directory. write(path) saves the parts under path; every
+# file is then listed in a manifest with its size and checksum, along with
+# the snapshot version and info (a JSON-able dict describing what was saved).
+# The parts are written to a staging directory that replaces the old
+# snapshot when complete, so a half-written snapshot is never opened.
+def write_snapshot(directory, write, info):
+    directory = os.path.abspath(directory)
+    staging = directory + ".building"
+    previous = directory + ".previous"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    try:
+        write(staging)
+        files = {}
+        for name in _files(staging):
+            path = os.path.join(staging, name)
+            files[name] = {"bytes": os.path.getsize(path), "crc32": _checksum(path)}
+        manifest = {"version": SNAPSHOT_VERSION, "created": datetime.now().isoformat(timespec="seconds"),
+                    **info, "files": files}
+        with open(os.path.join(staging, MANIFEST_NAME), "w") as f:
+            json.dump(manifest, f, indent=1)
+        shutil.rmtree(previous, ignore_errors=True)
+        if os.path.exists(directory):
+            os.rename(directory, previous)
+        os.rename(staging, directory)
+        # Processes that still map the old files keep reading them after this
+        shutil.rmtree(previous, ignore_errors=True)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return manifest
+
+
+# Manifest of the snapshot in directory, after checking its version and that
+# every file it lists has the recorded size and, with verify, checksum.
+# Raises SnapshotError when there is no usable snapshot.
+def read_manifest(directory, verify=True):
+    try:
+        with open(os.path.join(directory, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        raise SnapshotError(f"no snapshot in {directory}") from None
+    except (OSError, ValueError) as e:
+        raise SnapshotError(f"unreadable snapshot manifest: {e}") from e
+    if manifest.get("version") != SNAPSHOT_VERSION:
+        raise SnapshotError(f"snapshot version {manifest.get('version')}, expected {SNAPSHOT_VERSION}")
+    for name, expected in manifest["files"].items():
+        path = os.path.join(directory, name)
+        if not os.path.isfile(path):
+            raise SnapshotError(f"snapshot file {name} is missing")
+        if os.path.getsize(path) != expected["bytes"] or (verify and _checksum(path) != expected["crc32"]):
+            raise SnapshotError(f"snapshot file {name} is corrupt")
+    return manifest
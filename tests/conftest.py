@@ -0,0 +1,42 @@
+import importlib.util
+import os
+
+import pytest
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gradio-caseprism-ui.py")
+
+# Size and seed of the generated corpus the tests search
+RECORDS = 600
+SEED = 7
+
+# filter_rows arguments of a search that filters nothing
+NO_FILTERS = dict(court="ALL", bench="Select Bench", judge="", act_section="", decision_date_range=None, search_text="",
+                  search_type="Phrase(s)", time_filter="ALL", case_type="Select Case Subject", case_no="", year="",
+                  party="", disposal_nature="Select Disposal Nature", search_method="Exact Match")
+
+
+# The app on a seeded corpus, built from the source with its snapshot and
+# semantic index kept under directory
+def load_app(directory, name):
+    spec = importlib.util.spec_from_file_location(name, APP_PATH)
+    app = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(app)
+    app.DATA_SOURCE = None
+    app.NUM_RECORDS = RECORDS
+    app.SEED = SEED
+    app.INDEX_DIR = str(directory / "case_index")
+    app.SEMANTIC_INDEX_DIR = str(directory / "semantic_index")
+    app.load_data(use_snapshot=False)
+    return app
+
+
+# One app per test module, for tests that only search
+@pytest.fixture(scope="module")
+def app(request, tmp_path_factory):
+    return load_app(tmp_path_factory.mktemp("app"), f"caseprism_app_{request.module.__name__}")
+
+
+# An app of the test's own, for tests that add records
+@pytest.fixture
+def fresh_app(request, tmp_path):
+    return load_app(tmp_path, f"caseprism_app_{request.node.name}")
@@ -0,0 +1,67 @@
+import pytest
+
+from citations import CitationIndex, extract_citations
+from conftest import NO_FILTERS, RECORDS
+from data_source import generate_dummy_data
+
+
+@pytest.mark.parametrize("text,expected", [
+    ("(2017) 10 SCC 1", ["(2017) 10 SCC 1"]),
+    ("(2017) 10 S.C.C. 1", ["(2017) 10 SCC 1"]),
+    ("[2017] 010 scc 001", ["(2017) 10 SCC 1"]),
+    ("[1950] 1 SCR 88", ["[1950] 1 SCR 88"]),
+    ("(1950) 1 S.C.R. 88", ["[1950] 1 SCR 88"]),
+    ("(2020) 5 SCALE 12", ["(2020) 5 SCALE 12"]),
+    ("A.I.R. 1973 S.C. 1461", ["AIR 1973 SC 1461"]),
+    ("air 2005 bom 12", ["AIR 2005 Bom 12"]),
+    ("AIR 2010 P & H 5", ["AIR 2010 P&H 5"]),
+    ("2023 INSC 123", ["2023 INSC 123"]),
+    # "AIR" must start a word, and only known AIR courts count
+    ("FAIR 1973 SC 1461", []),
+    ("AIR 1973 XYZ 1461", []),
+    ("no citations here", []),
+    # Distinct citations, in order of appearance
+    ("Relying on AIR 1973 SC 1461, (2017) 10 SCC 1 and A.I.R. 1973 S.C. 1461",
+     ["AIR 1973 SC 1461", "(2017) 10 SCC 1"]),
+])
+def test_extract_citations(text, expected):
+    assert extract_citations(text) == expected
+
+
+def test_index_merges_rows_added_after_use(tmp_path):
+    index = CitationIndex()
+    index.add([0, 1], ["AIR 1973 SC 1461", "(2017) 10 SCC 1"], ["", "Following AIR 1973 SC 1461."])
+    cited, unresolved, citing = index.related(0)
+    assert (cited.tolist(), unresolved, citing.tolist()) == ([], [], [1])
+
+    # Rows added after the adjacencies were built, to the index in memory
+    # and to a saved and reloaded one
+    index.save(str(tmp_path / "citations"))
+    for index in (index, CitationIndex.load(str(tmp_path / "citations"))):
+        index.add([2], [None], ["See AIR 1973 SC 1461, (2017) 10 SCC 1 and [1950] 1 SCR 88."])
+        assert index.related(0)[2].tolist() == [1, 2]
+        assert index.related(1)[2].tolist() == [2]
+        cited, unresolved, citing = index.related(2)
+        assert (cited.tolist(), unresolved, citing.tolist()) == ([0, 1], ["[1950] 1 SCR 88"], [])
+        assert index.reported_rows(index.lookup("A.I.R. 1973 S.C. 1461")).tolist() == [0]
+
+
+def test_related_after_add_cases_on_loaded_snapshot(fresh_app):
+    app = fresh_app
+    app.save_snapshot(app.INDEX_DIR)
+    app.open_snapshot(app.INDEX_DIR)
+    cited_row = 0
+    citation = app.cases.column("Citation", [cited_row]).iloc[0]
+    records = generate_dummy_data(2, seed=5).to_dict("records")
+    records[0].update({"Citation": "(2030) 1 SCC 1", "Judgement Text": f"Following {citation}, the appeal fails."})
+    records[1].update({"Citation": "(2030) 1 SCC 2", "Judgement Text": "As held in (2030) 1 SCC 1, and (2030) 9 SCC 9."})
+    first, second = app.add_cases(records).tolist()
+    assert (first, second) == (RECORDS, RECORDS + 1)
+
+    assert first in app.citation_index.related(cited_row)[2]
+    cited, unresolved, citing = app.citation_index.related(first)
+    assert cited_row in cited and citing.tolist() == [second]
+    cited, unresolved, citing = app.citation_index.related(second)
+    assert (cited.tolist(), unresolved, citing.tolist()) == ([first], ["(2030) 9 SCC 9"], [])
+    # The citation filter finds the new case and the case citing it
+    assert app.filter_rows(**dict(NO_FILTERS, citation="(2030) 1 SCC 1")).tolist() == [first, second]
@@ -0,0 +1,57 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import RECORDS
+from data_source import generate_dummy_data
+
+SEARCH_TEXTS = ["court", "res judicata", "Union of India", "n the", "section 302", "Hindu Marriage Act", "zzz",
+                # Regular expressions, matched by scanning the candidates
+                "ltd.", "c.urt", "Article 3[0-9]", "(?:appeal|petition)", "co+urt has"]
+SEARCH_TYPES = ["Phrase(s)", "Any Words", "All Words"]
+COURTS = ["ALL", "Supreme Court"]
+
+
+# Row ids matching the search, found by scanning every case as the original
+# filter_data did
+def scanned_rows(app, search_text, search_type, court):
+    rows = np.arange(len(app.cases))
+    frame = app.cases.take(rows)
+    titles = frame["Case Title"].astype(str)
+    texts = pd.Series(list(app.judgement_texts.get(rows)), index=frame.index)
+    if search_type == "Phrase(s)":
+        matched = titles.str.contains(search_text, case=False) | texts.str.contains(search_text, case=False)
+    else:
+        words = [word.lower() for word in search_text.split()]
+        combine = any if search_type == "Any Words" else all
+        matched = texts.apply(lambda text: combine(word in text.lower() for word in words))
+    if court != "ALL":
+        matched &= frame["Court"].astype(str) == court
+    return np.flatnonzero(matched.to_numpy(dtype=bool))
+
+
+def search(app, search_text, search_type, court):
+    return app.filter_rows(court, "Select Bench", "", "", None, search_text, search_type, "ALL",
+                           "Select Case Subject", "", "", "", "Select Disposal Nature", "Exact Match")
+
+
+@pytest.mark.parametrize("search_text,search_type,court", list(itertools.product(SEARCH_TEXTS, SEARCH_TYPES, COURTS)))
+def test_filter_rows_matches_scan(app, search_text, search_type, court):
+    expected = scanned_rows(app, search_text, search_type, court)
+    assert search(app, search_text, search_type, court).tolist() == expected.tolist()
+    # Again from the result cache
+    assert search(app, search_text, search_type, court).tolist() == expected.tolist()
+
+
+def test_filter_rows_after_add_cases(fresh_app):
+    app = fresh_app
+    # Cache results from before the records are added
+    for search_text, search_type in itertools.product(SEARCH_TEXTS, SEARCH_TYPES):
+        search(app, search_text, search_type, "ALL")
+    row_ids = app.add_cases(generate_dummy_data(50, seed=11).to_dict("records"))
+    assert row_ids.tolist() == list(range(RECORDS, RECORDS + 50))
+    for search_text, search_type, court in itertools.product(SEARCH_TEXTS, SEARCH_TYPES, COURTS):
+        expected = scanned_rows(app, search_text, search_type, court)
+        assert search(app, search_text, search_type, court).tolist() == expected.tolist(), (search_text, search_type)
@@ -0,0 +1,67 @@
+import numpy as np
+
+from conftest import NO_FILTERS
+from query_cache import QueryCache
+
+QUERIES = 1500
+
+# Values of each filter the replayed queries combine. Names and citations
+# reorder their results (by similarity, reported judgement first), which must
+# not leak into the queries refined from them.
+FILTER_VALUES = {
+    "court": ["Supreme Court", "Delhi High Court", "Bombay High Court"],
+    "case_type": ["Writ Petition", "Criminal Appeal"],
+    "year": ["2015", "2019", "2022"],
+    "judge": ["chandrachud", "khanna", "nariman"],
+    "party": ["india", "tata", "maharashtra", "union of indai"],
+    "lawyer": ["hegde", "singh"],
+    "act_section": ["302", "Article 32", "Companies Act"],
+    "legal_terms": ["mens rea", "res judicata, appeal"],
+    "decision_date_range": [["2018-01-01", "2021-12-31"], ["2020-06-01", "2024-06-30"]],
+    "text": [("court", "Phrase(s)", "Exact Match"), ("appeal petition", "Any Words", "Exact Match"),
+             ("the court", "All Words", "Exact Match"), ("c.urt", "Phrase(s)", "Exact Match"),
+             ("court order", "All Words", "Ranked"), ("property dispute", "Phrase(s)", "Semantic Search")],
+}
+
+
+# Seeded queries of one to three filters, with citations drawn from the index
+def replayed_queries(app, count, seed):
+    rng = np.random.default_rng(seed)
+    values = dict(FILTER_VALUES, citation=list(app.citation_index.citations[:5]))
+    queries = []
+    for _ in range(count):
+        query = dict(NO_FILTERS)
+        for name in rng.choice(sorted(values), rng.integers(1, 4), replace=False):
+            value = values[name][rng.integers(len(values[name]))]
+            if name == "text":
+                query["search_text"], query["search_type"], query["search_method"] = value
+            elif name == "decision_date_range":
+                query["time_filter"] = "Custom range"
+                query["decision_date_range"] = value
+            else:
+                query[name] = value
+        queries.append(query)
+    return queries
+
+
+def test_cached_and_refined_results_match_cold_search(app):
+    app.query_cache.clear()
+    before = app.query_cache.stats()
+    for query in replayed_queries(app, QUERIES, seed=3):
+        rows = app.filter_rows(**query)
+        assert np.array_equal(rows, app.run_filters(**query)), query
+    stats = app.query_cache.stats()
+    assert stats["hits"] > before["hits"]
+    assert stats["refinements"] > before["refinements"]
+
+
+def test_find_superset_picks_smallest_refinable_subset():
+    cache = QueryCache()
+    cache.put((("court", "A"),), np.arange(10), 1)
+    cache.put((("year", "2015"),), np.arange(4), 1)
+    cache.put((("text", ("ranked", "x", False)),), np.arange(2), 1, refinable=False)
+    key = (("court", "A"), ("text", ("ranked", "x", False)), ("year", "2015"))
+    assert cache.find_superset(key, 1).tolist() == [0, 1, 2, 3]
+    assert cache.find_superset((("court", "B"),), 1) is None
+    # A new dataset version drops every entry
+    assert cache.find_superset(key, 2) is None